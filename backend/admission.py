@@ -0,0 +1,138 @@
+"""
+Admission control for heavy endpoints
+Each controller caps how many requests run at once, globally and per user,
+and lets a bounded number wait for a slot. When the wait queue is full (or a
+request waits too long) the request is rejected with 429 and a Retry-After
+header instead of piling onto an overloaded worker.
+"""
+import asyncio
+import os
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
+from fastapi import HTTPException, status
+
+
+class AdmissionController:
+    """Concurrency limiter with per-user limits and a bounded wait queue"""
+
+    def __init__(self, name: str, global_limit: int, per_user_limit: int,
+                 max_queue: int, per_user_queue: int, queue_timeout: float, retry_after: int):
+        self.name = name
+        self.global_limit = global_limit
+        self.per_user_limit = per_user_limit
+        self.max_queue = max_queue
+        self.per_user_queue = per_user_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._active_by_user = defaultdict(int)
+        self._queued_by_user = defaultdict(int)
+        self._condition = None
+
+    def _can_run(self, user: str) -> bool:
+        return self.active < self.global_limit and self._active_by_user[user] < self.per_user_limit
+
+    def _reject(self, detail: str):
+        self.rejected += 1
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=detail,
+            headers={"Retry-After": str(self.retry_after)}
+        )
+
+    @asynccontextmanager
+    async def slot(self, user: str, wait: bool = False):
+        """Hold one execution slot for `user`, waiting in the queue if needed
+
+        With `wait`, the caller is never rejected and waits as long as it
+        takes; for background work that is already bounded by its own queue.
+        """
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+
+        async with self._condition:
+            if not self._can_run(user):
+                if not wait and (self.queued >= self.max_queue or self._queued_by_user[user] >= self.per_user_queue):
+                    self._reject(f"Too many concurrent {self.name} requests, please retry later")
+
+                self.queued += 1
+                self._queued_by_user[user] += 1
+                try:
+                    await asyncio.wait_for(
+                        self._condition.wait_for(lambda: self._can_run(user)),
+                        timeout=None if wait else self.queue_timeout
+                    )
+                except asyncio.TimeoutError:
+                    self.timed_out += 1
+                    self._reject(f"Timed out waiting for a {self.name} slot, please retry later")
+                finally:
+                    self.queued -= 1
+                    self._queued_by_user[user] -= 1
+                    if not self._queued_by_user[user]:
+                        del self._queued_by_user[user]
+
+            self.active += 1
+            self._active_by_user[user] += 1
+            self.admitted += 1
+
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.active -= 1
+                self._active_by_user[user] -= 1
+                if not self._active_by_user[user]:
+                    del self._active_by_user[user]
+                self._condition.notify_all()
+
+    def stats(self) -> dict:
+        return {
+            "active": self.active,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "limits": {
+                "global": self.global_limit,
+                "per_user": self.per_user_limit,
+                "max_queue": self.max_queue,
+                "per_user_queue": self.per_user_queue,
+            },
+        }
+
+
+upload_admission = AdmissionController(
+    "upload",
+    global_limit=int(os.getenv("UPLOAD_CONCURRENCY", "4")),
+    per_user_limit=int(os.getenv("UPLOAD_CONCURRENCY_PER_USER", "1")),
+    max_queue=int(os.getenv("UPLOAD_QUEUE_SIZE", "16")),
+    per_user_queue=int(os.getenv("UPLOAD_QUEUE_SIZE_PER_USER", "2")),
+    queue_timeout=float(os.getenv("UPLOAD_QUEUE_TIMEOUT", "30")),
+    retry_after=10,
+)
+
+summary_admission = AdmissionController(
+    "summary",
+    global_limit=int(os.getenv("SUMMARY_CONCURRENCY", "8")),
+    per_user_limit=int(os.getenv("SUMMARY_CONCURRENCY_PER_USER", "2")),
+    max_queue=int(os.getenv("SUMMARY_QUEUE_SIZE", "64")),
+    per_user_queue=int(os.getenv("SUMMARY_QUEUE_SIZE_PER_USER", "8")),
+    queue_timeout=float(os.getenv("SUMMARY_QUEUE_TIMEOUT", "10")),
+    retry_after=2,
+)
+
+join_admission = AdmissionController(
+    "join",
+    global_limit=int(os.getenv("JOIN_CONCURRENCY", "2")),
+    per_user_limit=int(os.getenv("JOIN_CONCURRENCY_PER_USER", "1")),
+    max_queue=int(os.getenv("JOIN_QUEUE_SIZE", "8")),
+    per_user_queue=int(os.getenv("JOIN_QUEUE_SIZE_PER_USER", "2")),
+    queue_timeout=float(os.getenv("JOIN_QUEUE_TIMEOUT", "30")),
+    retry_after=10,
+)
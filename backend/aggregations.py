@@ -0,0 +1,373 @@
+"""
+Chart aggregations
+Exact group-by aggregations over a DataFrame, and approximate ones computed
+from a dataset's reservoir sample with scaled totals and 95% error bounds.
+Histograms of numeric columns are binned from a t-digest and counted exactly
+one chunk at a time.
+"""
+import math
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from fastapi import HTTPException, status
+
+from sketches import TDigest
+
+Z_95 = 1.96
+HISTOGRAM_BINNING = ("width", "quantile", "fd")
+
+
+def resolve_value_column(df: pd.DataFrame, value_column: Optional[str]) -> str:
+    """Return the column to aggregate, defaulting to the first numeric one"""
+    if not value_column:
+        # If no value column specified, try to find a numeric column
+        numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+        if not numeric_cols:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No numeric columns found for aggregation"
+            )
+        value_column = numeric_cols[0]
+
+    if value_column not in df.columns:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Value column '{value_column}' not found in dataset"
+        )
+    return value_column
+
+
+def to_chart_data(result: dict) -> list:
+    """Convert an aggregation result to chart-friendly format"""
+    return [
+        {"name": str(k), "value": float(v) if isinstance(v, (int, float)) else v}
+        for k, v in result.items()
+    ]
+
+
+def aggregate(df: pd.DataFrame, column: str, aggregation: str, value_column: Optional[str]) -> dict:
+    """Group by `column` and aggregate exactly; returns {group: value}
+
+    Sums and averages coerce the value column to numbers and ignore values
+    that do not parse, such as '' (how missing cells are stored); minima and
+    maxima compare raw values. `RunningAggregate` follows the same rules.
+    """
+    if aggregation == "count":
+        # Count occurrences of each unique value
+        return df[column].value_counts().to_dict()
+
+    # For sum, avg, min, max - need a value column
+    value_column = resolve_value_column(df, value_column)
+
+    # Group by column and aggregate value_column
+    if aggregation in ("sum", "average", "avg"):
+        grouped = pd.to_numeric(df[value_column], errors="coerce").groupby(df[column])
+        if aggregation == "sum":
+            return grouped.sum().to_dict()
+        # Groups without a single number have no average
+        return grouped.mean().dropna().to_dict()
+    elif aggregation == "min":
+        return df.groupby(column)[value_column].min().to_dict()
+    elif aggregation == "max":
+        return df.groupby(column)[value_column].max().to_dict()
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid aggregation type"
+    )
+
+
+def aggregate_sample(
+    sample: pd.DataFrame,
+    population: int,
+    column: str,
+    aggregation: str,
+    value_column: Optional[str]
+) -> list:
+    """Estimate a group-by aggregation from a uniform sample of `population` rows
+
+    Counts and sums are scaled by population / sample size. Each item carries
+    an `error`: the half-width of a 95% confidence interval (with finite
+    population correction), or None for min/max, which have no useful bound.
+    """
+    n = len(sample)
+    if n == 0:
+        return []
+    scale = population / n
+    fpc = max(1.0 - n / population, 0.0) if population else 0.0
+
+    if aggregation == "count":
+        counts = sample[column].value_counts()
+        p = counts / n
+        errors = Z_95 * population * np.sqrt(p * (1 - p) / n * fpc)
+        return [
+            {"name": str(k), "value": float(c * scale), "error": float(errors[k])}
+            for k, c in counts.items()
+        ]
+
+    value_column = resolve_value_column(sample, value_column)
+    values = pd.to_numeric(sample[value_column], errors="coerce")
+    grouped = values.groupby(sample[column])
+
+    if aggregation == "sum":
+        # Per-row contribution z = value if in group else 0, so the group
+        # total is population * mean(z)
+        sums = grouped.sum()
+        squares = (values ** 2).groupby(sample[column]).sum()
+        if n > 1:
+            variance = ((squares - sums ** 2 / n) / (n - 1)).clip(lower=0)
+        else:
+            variance = sums * 0
+        errors = Z_95 * population * np.sqrt(variance / n * fpc)
+        return [
+            {"name": str(k), "value": float(s * scale), "error": float(errors[k])}
+            for k, s in sums.items()
+        ]
+
+    if aggregation in ("average", "avg"):
+        stats = grouped.agg(["mean", "std", "count"])
+        items = []
+        for k, row in stats.iterrows():
+            if not row["count"]:
+                continue
+            std = row["std"] if row["count"] > 1 else 0.0
+            error = Z_95 * std / np.sqrt(row["count"]) * np.sqrt(fpc)
+            items.append({"name": str(k), "value": float(row["mean"]), "error": float(error)})
+        return items
+
+    if aggregation in ("min", "max"):
+        # Sample extremes are biased inwards and have no distribution-free bound
+        result = aggregate(sample, column, aggregation, value_column)
+        return [{**item, "error": None} for item in to_chart_data(result)]
+
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail="Invalid aggregation type"
+    )
+
+
+def _factorize(series: pd.Series):
+    """Integer codes and labels for a column, with labels sorted when comparable"""
+    try:
+        return pd.factorize(series, sort=True)
+    except TypeError:
+        # Mixed types (e.g. numbers and strings) cannot be ordered
+        return pd.factorize(series)
+
+
+def pivot(
+    df: pd.DataFrame,
+    row_column: str,
+    col_column: str,
+    aggregation: str,
+    value_column: Optional[str],
+    max_cells: int
+) -> dict:
+    """Group by two columns and aggregate into a dense row x column matrix
+
+    Both columns are factorized to integer codes; every row then maps to one
+    flat cell index, and the cell aggregates are computed with bincount (or
+    ufunc.at for min/max). Cells without rows (or without numeric values)
+    are None. Rows with a missing row or column key are skipped, as the
+    group-by in `aggregate` skips them.
+    """
+    row_codes, row_labels = _factorize(df[row_column])
+    col_codes, col_labels = _factorize(df[col_column])
+    n_rows, n_cols = len(row_labels), len(col_labels)
+    if n_rows * n_cols > max_cells:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Pivot would have {n_rows} x {n_cols} cells (limit {max_cells})"
+        )
+    # factorize codes missing keys as -1
+    keyed = (row_codes >= 0) & (col_codes >= 0)
+    cells = row_codes[keyed].astype(np.int64) * n_cols + col_codes[keyed]
+    size = n_rows * n_cols
+
+    if aggregation == "count":
+        value_column = None
+        matrix = np.bincount(cells, minlength=size).astype(np.float64)
+    else:
+        value_column = resolve_value_column(df, value_column)
+        values = pd.to_numeric(df[value_column], errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)[keyed]
+        valid = ~np.isnan(values)
+        cells, values = cells[valid], values[valid]
+        filled = np.bincount(cells, minlength=size) > 0
+
+        if aggregation == "sum":
+            matrix = np.bincount(cells, weights=values, minlength=size)
+        elif aggregation in ("average", "avg"):
+            counts = np.bincount(cells, minlength=size)
+            matrix = np.bincount(cells, weights=values, minlength=size) / np.maximum(counts, 1)
+        elif aggregation == "min":
+            matrix = np.full(size, np.inf)
+            np.minimum.at(matrix, cells, values)
+        elif aggregation == "max":
+            matrix = np.full(size, -np.inf)
+            np.maximum.at(matrix, cells, values)
+        else:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid aggregation type"
+            )
+        matrix = np.where(filled, matrix, np.nan)
+
+    matrix = matrix.reshape(n_rows, n_cols)
+    return {
+        "row_column": row_column,
+        "column_column": col_column,
+        "aggregation": aggregation,
+        "value_column": value_column,
+        "rows": [str(label) for label in row_labels],
+        "columns": [str(label) for label in col_labels],
+        "values": [
+            [None if np.isnan(v) else float(v) for v in row]
+            for row in matrix.tolist()
+        ],
+    }
+
+
+class RunningAggregate:
+    """Group-by aggregation folded in one DataFrame chunk at a time
+
+    Keeps mergeable per-group state (counts, sums, minima, maxima) so a
+    partial result is available after every chunk. Values are treated as in
+    `aggregate`, so the final result equals it on the same rows.
+    """
+
+    def __init__(self, column: str, aggregation: str, value_column: Optional[str]):
+        if aggregation not in ("count", "sum", "average", "avg", "min", "max"):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Invalid aggregation type"
+            )
+        self.column = column
+        self.aggregation = aggregation
+        self.value_column = value_column
+        self.rows = 0
+        self.state = None  # DataFrame indexed by group
+
+    def update(self, df: pd.DataFrame, rows_read: Optional[int] = None):
+        """Fold in a chunk; `rows_read` counts rows before any filtering"""
+        self.rows += len(df) if rows_read is None else rows_read
+        if df.empty:
+            return
+        if self.aggregation == "count":
+            part = df[self.column].value_counts().to_frame("value")
+        else:
+            # Without an explicit value column, the first chunk decides
+            self.value_column = resolve_value_column(df, self.value_column)
+            if self.aggregation in ("sum", "average", "avg"):
+                values = pd.to_numeric(df[self.value_column], errors="coerce")
+                grouped = values.groupby(df[self.column])
+                part = pd.DataFrame({"value": grouped.sum(), "count": grouped.count()})
+            else:
+                # Raw values, as in `aggregate`: text columns compare as text
+                grouped = df[self.value_column].groupby(df[self.column])
+                part = grouped.agg(self.aggregation).to_frame("value")
+
+        if self.state is None:
+            self.state = part
+        elif self.aggregation in ("min", "max"):
+            combined = pd.concat([self.state, part])
+            self.state = combined.groupby(level=0, sort=False).agg(self.aggregation)
+        else:
+            self.state = self.state.add(part, fill_value=0)
+
+    def result(self, total_rows: Optional[int] = None) -> list:
+        """Chart data so far; with `total_rows`, counts and sums are extrapolated"""
+        if self.state is None:
+            return []
+        state = self.state
+        if self.aggregation in ("average", "avg"):
+            state = state[state["count"] > 0]
+            values = state["value"] / state["count"]
+        else:
+            values = state["value"]
+            if total_rows and self.rows and self.aggregation in ("count", "sum"):
+                values = values * (total_rows / self.rows)
+        values = values.dropna()
+        if self.aggregation == "count":
+            # Same order as value_counts: most frequent first
+            values = values.sort_values(ascending=False, kind="stable")
+            if not total_rows:
+                values = values.astype(np.int64)
+        else:
+            try:
+                values = values.sort_index()
+            except TypeError:
+                pass  # Mixed-type groups cannot be ordered
+        return to_chart_data(values.to_dict())
+
+
+def numeric_values(series: pd.Series) -> np.ndarray:
+    """Finite numbers in a column; text that does not parse (and '') is skipped"""
+    values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    return values[np.isfinite(values)]
+
+
+def histogram_edges(digest: TDigest, binning: str, bins: int, max_bins: int) -> np.ndarray:
+    """Bin edges over [min, max] of the values summarized by `digest`
+
+    - width: `bins` equal-width bins
+    - quantile: `bins` bins holding about the same number of values each
+    - fd: Freedman-Diaconis width 2 * IQR / n^(1/3), capped at `max_bins`
+      bins (Sturges' rule when the IQR is 0)
+    """
+    if binning not in HISTOGRAM_BINNING:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Binning must be one of {', '.join(HISTOGRAM_BINNING)}"
+        )
+    if not digest.count:
+        return np.empty(0)
+    low, high = digest.min, digest.max
+    if low == high:
+        return np.array([low, high])
+
+    if binning == "quantile":
+        edges = np.array([digest.quantile(q) for q in np.linspace(0, 1, bins + 1)])
+        edges[0], edges[-1] = low, high
+        return np.unique(edges)
+
+    if binning == "fd":
+        iqr = digest.quantile(0.75) - digest.quantile(0.25)
+        if iqr > 0:
+            width = 2 * iqr / digest.count ** (1 / 3)
+            bins = math.ceil((high - low) / width)
+        else:
+            bins = math.ceil(math.log2(digest.count)) + 1
+        bins = min(max(bins, 1), max_bins)
+    return np.linspace(low, high, bins + 1)
+
+
+class RunningHistogram:
+    """Exact counts per bin, folded in one chunk of values at a time
+
+    Bins are half-open [start, end) except the last, which includes its end
+    (as in numpy.histogram); values outside the edges are not counted.
+    """
+
+    def __init__(self, edges: np.ndarray):
+        self.edges = edges
+        self.counts = np.zeros(max(len(edges) - 1, 0), dtype=np.int64)
+
+    def update(self, values: np.ndarray):
+        if not len(self.counts) or not len(values):
+            return
+        bins = np.searchsorted(self.edges, values, side="right") - 1
+        bins[values == self.edges[-1]] = len(self.counts) - 1
+        inside = (bins >= 0) & (bins < len(self.counts))
+        self.counts += np.bincount(bins[inside], minlength=len(self.counts))
+
+    def result(self) -> list:
+        """Chart data with each bin's edges"""
+        return [
+            {
+                "name": f"{start:g} – {end:g}",
+                "value": int(count),
+                "start": float(start),
+                "end": float(end),
+            }
+            for start, end, count in zip(self.edges[:-1], self.edges[1:], self.counts)
+        ]
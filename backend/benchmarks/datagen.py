@@ -0,0 +1,48 @@
+"""
+Synthetic dataset generator for the benchmark suite
+Produces reproducible CSV/Excel payloads with a configurable shape
+"""
+import io
+import numpy as np
+import pandas as pd
+
+
+def make_dataframe(rows: int, columns: int, cardinality: int, seed: int = 42) -> pd.DataFrame:
+    """Build a DataFrame with alternating categorical and numeric columns
+
+    Even-numbered columns are categorical strings drawn from `cardinality`
+    distinct values, odd-numbered columns are floats. The first column is
+    always categorical so it can be used as the summary group-by column.
+    """
+    rng = np.random.default_rng(seed)
+    labels = np.array([f"cat_{i}" for i in range(max(cardinality, 1))])
+
+    data = {}
+    for i in range(max(columns, 1)):
+        if i % 2 == 0:
+            data[f"category_{i}"] = labels[rng.integers(0, len(labels), size=rows)]
+        else:
+            data[f"value_{i}"] = np.round(rng.normal(100.0, 25.0, size=rows), 2)
+    return pd.DataFrame(data)
+
+
+def to_csv_bytes(df: pd.DataFrame) -> bytes:
+    """Serialize a DataFrame to CSV bytes"""
+    return df.to_csv(index=False).encode("utf-8")
+
+
+def to_excel_bytes(df: pd.DataFrame) -> bytes:
+    """Serialize a DataFrame to .xlsx bytes"""
+    buffer = io.BytesIO()
+    df.to_excel(buffer, index=False)
+    return buffer.getvalue()
+
+
+def make_payload(fmt: str, rows: int, columns: int, cardinality: int, seed: int = 42):
+    """Return (filename, bytes, dataframe) for the requested format"""
+    df = make_dataframe(rows, columns, cardinality, seed)
+    if fmt == "csv":
+        return f"bench_{rows}x{columns}.csv", to_csv_bytes(df), df
+    if fmt == "xlsx":
+        return f"bench_{rows}x{columns}.xlsx", to_excel_bytes(df), df
+    raise ValueError(f"Unsupported format: {fmt}")
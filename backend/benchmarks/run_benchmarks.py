@@ -0,0 +1,274 @@
+"""
+Benchmark suite for the DataViz Pro API
+Runs upload, page, summary and list workloads in-process against the FastAPI
+app and writes throughput and latency percentiles to a JSON results file.
+
+By default the app talks to an in-memory Mongo stand-in (mongomock-motor), so
+no database server is needed. Pass --mongo-url to benchmark against a real
+local mongod instead (a throwaway database is used and dropped afterwards).
+
+Examples:
+    python benchmarks/run_benchmarks.py --rows 50000 --columns 8 --cardinality 20
+    python benchmarks/run_benchmarks.py --format xlsx --output results/xlsx.json
+    python benchmarks/run_benchmarks.py --compare results/before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import httpx  # noqa: E402
+
+import database  # noqa: E402
+import main  # noqa: E402
+from datagen import make_payload  # noqa: E402
+
+BENCH_DATABASE_NAME = "dataviz_pro_bench"
+BENCH_USER = {"email": "bench@example.com", "password": "bench-password"}
+DEFAULT_RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="DataViz Pro API benchmark suite")
+    parser.add_argument("--rows", type=int, default=10000, help="rows per generated dataset")
+    parser.add_argument("--columns", type=int, default=6, help="columns per generated dataset")
+    parser.add_argument("--cardinality", type=int, default=25, help="distinct values per categorical column")
+    parser.add_argument("--format", choices=["csv", "xlsx"], default="csv", help="upload file format")
+    parser.add_argument("--datasets", type=int, default=3, help="number of datasets to upload")
+    parser.add_argument("--requests", type=int, default=50, help="requests per read workload")
+    parser.add_argument("--concurrency", type=int, default=4, help="concurrent in-flight requests")
+    parser.add_argument("--seed", type=int, default=42, help="seed for data generation and request mix")
+    parser.add_argument("--workloads", default="upload,page,summary,list",
+                        help="comma separated workloads to run")
+    parser.add_argument("--mongo-url", default=None, help="use a real MongoDB instead of the in-memory stand-in")
+    parser.add_argument("--output", default=None, help="path of the JSON results file")
+    parser.add_argument("--compare", default=None, help="previous results file to diff against")
+    return parser.parse_args(argv)
+
+
+def summarize_latencies(latencies, errors, elapsed):
+    """Reduce raw latencies (seconds) to throughput and percentile stats"""
+    ms = np.array(latencies) * 1000.0
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 4),
+        "throughput_rps": round(count / elapsed, 2) if elapsed > 0 else None,
+        "latency_ms": {
+            "mean": round(float(ms.mean()), 3) if count else None,
+            "p50": round(float(np.percentile(ms, 50)), 3) if count else None,
+            "p95": round(float(np.percentile(ms, 95)), 3) if count else None,
+            "p99": round(float(np.percentile(ms, 99)), 3) if count else None,
+            "max": round(float(ms.max()), 3) if count else None,
+        },
+    }
+
+
+async def run_workload(make_request, total, concurrency):
+    """Issue `total` requests with bounded concurrency and time each one"""
+    latencies = []
+    errors = 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(i):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await make_request(i)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+    wall_start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(total)))
+    return summarize_latencies(latencies, errors, time.perf_counter() - wall_start)
+
+
+async def setup_database(mongo_url):
+    """Point the app's database module at the benchmark backend"""
+    database.DATABASE_NAME = BENCH_DATABASE_NAME
+    if mongo_url:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(mongo_url)
+        await client.drop_database(BENCH_DATABASE_NAME)
+        backend = "mongodb"
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        client = AsyncMongoMockClient()
+        backend = "mongomock"
+
+    async def connect_stub():
+        database.client = client
+
+    # The startup hook would otherwise connect to the configured Atlas cluster
+    main.connect_to_mongodb = connect_stub
+    await main.app.router.startup()
+    return client, backend
+
+
+async def authenticate(http):
+    """Create the benchmark user and return auth headers"""
+    await http.post("/auth/signup", json=BENCH_USER)
+    response = await http.post(
+        "/auth/token",
+        data={"username": BENCH_USER["email"], "password": BENCH_USER["password"]},
+    )
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def run_suite(args):
+    rng = random.Random(args.seed)
+    workloads = [w.strip() for w in args.workloads.split(",") if w.strip()]
+    client, backend = await setup_database(args.mongo_url)
+    results = {}
+
+    filename, payload, df = make_payload(args.format, args.rows, args.columns, args.cardinality, args.seed)
+    group_column = df.columns[0]
+    value_column = next((c for c in df.columns if c.startswith("value_")), None)
+    content_type = "text/csv" if args.format == "csv" else \
+        "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+
+    transport = httpx.ASGITransport(app=main.app)
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as http:
+            headers = await authenticate(http)
+
+            async def upload(i):
+                return await http.post(
+                    "/upload/",
+                    files={"file": (filename, payload, content_type)},
+                    headers=headers,
+                )
+
+            dataset_ids = []
+            if "upload" in workloads:
+                # Uploads are heavy, so they always run one at a time
+                results["upload"] = await run_workload(upload, args.datasets, 1)
+            else:
+                for i in range(args.datasets):
+                    await upload(i)
+
+            listing = await http.get("/data/datasets", headers=headers)
+            dataset_ids = [d["id"] for d in listing.json()]
+            if not dataset_ids:
+                raise RuntimeError("No datasets available for read workloads")
+
+            total_pages = max((args.rows + 49) // 50, 1)
+
+            async def page(i):
+                return await http.get(
+                    f"/data/{rng.choice(dataset_ids)}",
+                    params={"page": rng.randint(1, total_pages), "page_size": 50},
+                    headers=headers,
+                )
+
+            async def summary(i):
+                params = {"column": group_column, "aggregation": "count"}
+                if value_column and i % 2:
+                    params = {"column": group_column, "aggregation": "sum", "value_column": value_column}
+                return await http.get(
+                    f"/data/{rng.choice(dataset_ids)}/summary", params=params, headers=headers
+                )
+
+            async def list_datasets(i):
+                return await http.get("/data/datasets", headers=headers)
+
+            readers = {"page": page, "summary": summary, "list": list_datasets}
+            for name, make_request in readers.items():
+                if name in workloads:
+                    results[name] = await run_workload(make_request, args.requests, args.concurrency)
+    finally:
+        await main.app.router.shutdown()
+        if args.mongo_url:
+            await client.drop_database(BENCH_DATABASE_NAME)
+
+    return {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "backend": backend,
+            "params": {
+                "rows": args.rows,
+                "columns": args.columns,
+                "cardinality": args.cardinality,
+                "format": args.format,
+                "datasets": args.datasets,
+                "requests": args.requests,
+                "concurrency": args.concurrency,
+                "seed": args.seed,
+                "payload_bytes": len(payload),
+            },
+        },
+        "workloads": results,
+    }
+
+
+def git_commit():
+    """Current commit hash, or None outside a git checkout"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def print_report(report, baseline=None):
+    """Print a human readable table, with deltas against a baseline run"""
+    header = f"{'workload':<10}{'rps':>10}{'p50 ms':>12}{'p95 ms':>12}{'p99 ms':>12}{'errors':>8}"
+    print(header)
+    print("-" * len(header))
+    for name, stats in report["workloads"].items():
+        lat = stats["latency_ms"]
+        print(f"{name:<10}{stats['throughput_rps'] or 0:>10.1f}{lat['p50'] or 0:>12.2f}"
+              f"{lat['p95'] or 0:>12.2f}{lat['p99'] or 0:>12.2f}{stats['errors']:>8}")
+        if baseline and name in baseline.get("workloads", {}):
+            old = baseline["workloads"][name]
+            deltas = []
+            for key in ("p50", "p95", "p99"):
+                before, after = old["latency_ms"].get(key), lat.get(key)
+                if before and after:
+                    deltas.append(f"{key} {((after - before) / before) * 100:+.1f}%")
+            if old.get("throughput_rps") and stats.get("throughput_rps"):
+                change = (stats["throughput_rps"] - old["throughput_rps"]) / old["throughput_rps"] * 100
+                deltas.append(f"rps {change:+.1f}%")
+            print(f"{'':<10}vs baseline: {', '.join(deltas)}")
+
+
+def main_cli(argv=None):
+    args = parse_args(argv)
+    report = asyncio.run(run_suite(args))
+
+    output = args.output or os.path.join(
+        DEFAULT_RESULTS_DIR, f"bench_{datetime.utcnow().strftime('%Y%m%dT%H%M%S')}.json"
+    )
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+    print(f"\n📄 Results written to {output}")
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,70 @@
+"""
+Single-flight coalescing of identical concurrent requests
+When many tabs open the same dashboard, identical summary and page requests
+arrive together. The first one starts the computation as a task; duplicates
+that arrive while it is running await that same task instead of starting
+their own, and all of them get its result or its exception.
+
+The computation is detached from the request that started it: a caller
+that is cancelled only stops waiting, and the task itself is cancelled once
+no caller is waiting for it any more. Keys always include the owner, so
+results are never shared across users.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Hashable
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run at most one computation per key at a time and share its outcome"""
+
+    def __init__(self):
+        self.started = 0
+        self.coalesced = 0
+        self._flights = {}
+
+    def _finished(self, key: Hashable, flight: _Flight, task: asyncio.Task):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if not task.cancelled():
+            task.exception()  # Retrieved here in case every caller left
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable[Any]]) -> Any:
+        """Return the result of `compute()`, shared with identical in-flight calls"""
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(compute()))
+            flight.task.add_done_callback(lambda task: self._finished(key, flight, task))
+            self._flights[key] = flight
+            self.started += 1
+        else:
+            self.coalesced += 1
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.task.done():
+                # The last caller gave up waiting: nobody needs the result, and
+                # a later duplicate must start afresh rather than join a dying task
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                flight.task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._flights),
+            "started": self.started,
+            "coalesced": self.coalesced,
+        }
+
+
+request_coalescer = SingleFlight()
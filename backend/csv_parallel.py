@@ -0,0 +1,179 @@
+"""
+Parallel CSV parsing for large uploads
+The spooled file is split into byte ranges that start and end on record
+boundaries, each range is parsed by pd.read_csv in a separate process, and
+the parsed ranges are yielded in file order so rows are stored exactly as a
+sequential parse would store them.
+
+Record boundaries are found with one vectorized pass over the file that
+tracks quote parity: a newline ends a record only when an even number of
+quote characters precede it, so newlines inside quoted fields never split a
+record. Files where the quotes do not balance (e.g. stray quotes inside
+unquoted fields) are left to the sequential parser.
+"""
+import asyncio
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from pandas.errors import EmptyDataError
+
+# Every uvicorn worker has its own pool, so by default the node's cores are
+# split between them (uvicorn reads its worker count from WEB_CONCURRENCY)
+WEB_CONCURRENCY = max(int(os.getenv("WEB_CONCURRENCY", "1")), 1)
+CSV_PARSE_WORKERS = int(os.getenv("CSV_PARSE_WORKERS", str(max(1, (os.cpu_count() or 1) // WEB_CONCURRENCY))))
+PARALLEL_CSV_MIN_BYTES = int(os.getenv("PARALLEL_CSV_MIN_BYTES", str(64 << 20)))
+PARALLEL_CSV_RANGE_BYTES = int(os.getenv("PARALLEL_CSV_RANGE_BYTES", str(16 << 20)))
+SCAN_BLOCK_SIZE = 4 << 20
+
+NEWLINE = ord("\n")
+QUOTE = ord('"')
+
+_parse_pool: Optional[ProcessPoolExecutor] = None
+
+
+def parallel_csv_enabled(path: str) -> bool:
+    """Whether a spooled CSV is large enough to be worth parsing in parallel"""
+    return CSV_PARSE_WORKERS > 1 and os.path.getsize(path) >= PARALLEL_CSV_MIN_BYTES
+
+
+def get_parse_pool() -> ProcessPoolExecutor:
+    global _parse_pool
+    if _parse_pool is None:
+        # spawn: forking a process that runs an event loop and driver threads is unsafe
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=CSV_PARSE_WORKERS, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _parse_pool
+
+
+def shutdown_parse_pool():
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool.shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+
+def split_records(path: str, range_bytes: int = PARALLEL_CSV_RANGE_BYTES) -> Optional[Tuple[int, List[Tuple[int, int]]]]:
+    """Return (header_end, ranges) with every range on record boundaries
+
+    Returns None when the quotes in the file do not balance, since the
+    boundaries cannot be trusted then, or when the file has no newline
+    outside quotes.
+    """
+    size = os.path.getsize(path)
+    boundaries = []
+    target = 0  # The first boundary found ends the header record
+    offset = 0
+    odd = 0  # Parity of the quotes before `offset`
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(SCAN_BLOCK_SIZE)
+            if not block:
+                break
+            data = np.frombuffer(block, dtype=np.uint8)
+            end = offset + len(data)
+            parity = None
+            while target < end:
+                local = max(target - offset, 0)
+                newlines = np.flatnonzero(data[local:] == NEWLINE) + local
+                if not len(newlines):
+                    break
+                if parity is None:
+                    # uint8 wraps around, which keeps the low bit (the parity) exact
+                    parity = np.cumsum(data == QUOTE, dtype=np.uint8) & 1
+                outside = newlines[(parity[newlines] ^ odd) == 0]
+                if not len(outside):
+                    break
+                boundary = offset + int(outside[0]) + 1
+                boundaries.append(boundary)
+                target = boundary + range_bytes
+            odd ^= int(np.count_nonzero(data == QUOTE) & 1)
+            offset = end
+
+    if odd or not boundaries:
+        # No record boundary at all (e.g. CR-only line endings or a header
+        # without a newline): leave the file to the sequential parser
+        return None
+    header_end = boundaries[0]
+    edges = [b for b in boundaries if b < size] + [size]
+    return header_end, [(start, stop) for start, stop in zip(edges, edges[1:]) if stop > start]
+
+
+def read_header(path: str, header_end: int) -> List[str]:
+    """Column names exactly as pd.read_csv would name them (Unnamed: i, dup.1)"""
+    with open(path, "rb") as f:
+        header = f.read(header_end)
+    return list(pd.read_csv(io.BytesIO(header), nrows=0).columns)
+
+
+def parse_range(path: str, start: int, stop: int, columns: List[str]) -> pd.DataFrame:
+    """Parse the records in bytes [start, stop) of a CSV (runs in a worker process)"""
+    with open(path, "rb") as f:
+        f.seek(start)
+        data = f.read(stop - start)
+    try:
+        return pd.read_csv(io.BytesIO(data), header=None, names=columns)
+    except EmptyDataError:
+        return pd.DataFrame(columns=columns)  # Only blank lines in this range
+
+
+def reconcile(df: pd.DataFrame, numeric: set) -> pd.DataFrame:
+    """Align a range's dtypes with the ranges before it
+
+    Each range infers types on its own, so a column that is numeric elsewhere
+    comes back as text in a range holding one non-numeric value. Values in
+    such a range that parse as numbers are stored as numbers again.
+    """
+    for column in numeric:
+        series = df[column]
+        if series.dtype != object:
+            continue
+        converted = pd.to_numeric(series, errors="coerce")
+        df[column] = converted.astype(object).where(converted.notna(), series)
+    return df
+
+
+async def iter_csv_ranges(path: str, split: Tuple[int, List[Tuple[int, int]]], batch_rows: int):
+    """Asynchronously yield a CSV's rows as DataFrame batches, parsed in parallel
+
+    `split` comes from `split_records`. Ranges are parsed in the process pool
+    a bounded number ahead of the consumer and yielded in file order.
+    """
+    loop = asyncio.get_running_loop()
+    header_end, ranges = split
+    columns = await loop.run_in_executor(None, read_header, path, header_end)
+    if not ranges:
+        yield pd.DataFrame(columns=columns)
+        return
+
+    pool = get_parse_pool()
+    window = CSV_PARSE_WORKERS * 2
+    pending = []
+    numeric = None
+    try:
+        for index in range(len(ranges)):
+            # Keep a bounded number of ranges parsing ahead of the writer
+            while len(pending) < window and index + len(pending) < len(ranges):
+                start, stop = ranges[index + len(pending)]
+                pending.append(loop.run_in_executor(pool, parse_range, path, start, stop, columns))
+            df = await pending.pop(0)
+            if df.empty:
+                continue
+
+            if numeric is None:
+                numeric = {c for c in columns if pd.api.types.is_numeric_dtype(df[c])}
+            else:
+                df = await loop.run_in_executor(None, reconcile, df, numeric)
+            for offset in range(0, len(df), batch_rows):
+                yield df.iloc[offset:offset + batch_rows]
+    finally:
+        for future in pending:
+            future.cancel()
+
+    if numeric is None:
+        yield pd.DataFrame(columns=columns)
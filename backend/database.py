@@ -3,6 +3,7 @@ MongoDB Database Configuration
 This file handles all MongoDB connections and operations
 """
 from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import OperationFailure
 from typing import Optional
 from urllib.parse import quote_plus
 import os
@@ -53,11 +54,47 @@ def get_datasets_collection():
     db = get_database()
     return db.datasets
 
+def get_dataset_chunks_collection():
+    """Get dataset row chunks collection"""
+    db = get_database()
+    return db.dataset_chunks
+
+def get_dataset_samples_collection():
+    """Get dataset reservoir samples collection"""
+    db = get_database()
+    return db.dataset_samples
+
+def get_ingest_jobs_collection():
+    """Get background ingestion jobs collection"""
+    db = get_database()
+    return db.ingest_jobs
+
+def get_chart_definitions_collection():
+    """Get saved chart definitions collection"""
+    db = get_database()
+    return db.chart_definitions
+
+def get_chart_results_collection():
+    """Get materialized saved chart results collection"""
+    db = get_database()
+    return db.chart_results
+
+def get_leases_collection():
+    """Get leases collection (single-runner election for background tasks)"""
+    db = get_database()
+    return db.leases
+
 async def create_indexes():
     """Create database indexes for better performance"""
     try:
         users = get_users_collection()
         datasets = get_datasets_collection()
+        chunks = get_dataset_chunks_collection()
+        samples = get_dataset_samples_collection()
+        jobs = get_ingest_jobs_collection()
+        chart_definitions = get_chart_definitions_collection()
+        chart_results = get_chart_results_collection()
+        leases = get_leases_collection()
         
         # Users indexes
         await users.create_index("email", unique=True)
@@ -67,6 +104,36 @@ async def create_indexes():
         await datasets.create_index("user_email")
         await datasets.create_index("upload_date")
         await datasets.create_index([("user_email", 1), ("upload_date", -1)])
+        # Listing index: extends the one above with a tie-breaker for cursors
+        # and the listed fields, so listing pages are covered queries
+        await datasets.create_index([
+            ("user_email", 1), ("upload_date", -1), ("_id", -1),
+            ("filename", 1), ("row_count", 1), ("column_count", 1), ("file_size", 1)
+        ], name="datasets_listing")
+        # Datasets with an expires_at date are deleted once it passes; their
+        # rows are then removed by the background reclaimer
+        await datasets.create_index("expires_at", expireAfterSeconds=0)
+        
+        # Row chunk indexes (range lookups for pagination)
+        await chunks.create_index([("dataset_id", 1), ("start_row", 1)])
+        await samples.create_index("dataset_id", unique=True)
+        
+        # Ingestion job indexes (finished jobs expire after a week)
+        await jobs.create_index([("user_email", 1), ("created_at", -1)])
+        # Expiry runs from finished_at, which running jobs do not have yet
+        try:
+            await jobs.drop_index("created_at_1")
+        except OperationFailure:
+            pass  # Already replaced
+        await jobs.create_index("finished_at", expireAfterSeconds=7 * 24 * 3600)
+        
+        # Saved charts: one result per (dataset, definition), read per dataset
+        await chart_definitions.create_index([("user_email", 1), ("created_at", 1)])
+        await chart_results.create_index([("dataset_id", 1), ("definition_id", 1)], unique=True)
+        await chart_results.create_index("definition_id")
+        
+        # Leases of dead holders are removed once they expire
+        await leases.create_index("expires_at", expireAfterSeconds=0)
         
         print("✅ Database indexes created successfully")
     except Exception as e:
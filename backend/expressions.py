@@ -0,0 +1,370 @@
+"""
+Row filters and derived columns
+A small expression language for filters like `amount > 100 and region == "EU"`
+and derived values like `price * qty`. Expressions are parsed with Python's
+`ast` module, checked against a whitelist of node types and compiled into a
+tree of closures that evaluate whole columns at once with pandas/NumPy.
+Nothing is ever passed to eval, and names can only refer to columns.
+
+Column names that are not identifiers are written in backticks:
+`Order Date` >= "2024-01-01". Numeric operations coerce text to numbers
+(values that do not parse become NaN, and comparisons with NaN are false).
+"""
+import ast
+import operator
+import os
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+EXPRESSION_CACHE_SIZE = int(os.getenv("EXPRESSION_CACHE_SIZE", "256"))
+MAX_EXPRESSION_LENGTH = 1000
+MAX_EXPRESSION_NODES = 200
+
+BINARY_OPS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+COMPARE_OPS = {
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+}
+_BACKTICK = re.compile(r"`([^`]+)`")
+
+
+class ExpressionError(ValueError):
+    """Raised for expressions that cannot be parsed or evaluated"""
+
+
+def _numeric(value):
+    """Coerce a column (or scalar) to float so arithmetic stays vectorized and bounded"""
+    if isinstance(value, pd.Series):
+        if pd.api.types.is_bool_dtype(value):
+            return value.astype(np.float64)
+        return pd.to_numeric(value, errors="coerce").astype(np.float64)
+    if isinstance(value, (bool, int, float, np.number)):
+        return np.float64(value)
+    raise ExpressionError(f"Expected a number, got {value!r}")
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float, np.number)) and not isinstance(value, bool)
+
+
+def _compare(op, left, right):
+    if _is_number(left) or _is_number(right):
+        left, right = _numeric(left), _numeric(right)
+    elif isinstance(left, str) or isinstance(right, str):
+        left = left.astype(str) if isinstance(left, pd.Series) else left
+        right = right.astype(str) if isinstance(right, pd.Series) else right
+    elif isinstance(left, pd.Series) and isinstance(right, pd.Series):
+        if pd.api.types.is_numeric_dtype(left) or pd.api.types.is_numeric_dtype(right):
+            left, right = _numeric(left), _numeric(right)
+    return op(left, right)
+
+
+def _string_method(name: str) -> Callable:
+    def apply(series, *args, **kwargs):
+        if not isinstance(series, pd.Series):
+            raise ExpressionError(f"{name}() expects a column")
+        return getattr(series.astype(str).str, name)(*args, **kwargs)
+    return apply
+
+
+FUNCTIONS: Dict[str, Callable] = {
+    "abs": lambda value: np.abs(_numeric(value)),
+    "round": lambda value, digits=0: np.round(_numeric(value), int(digits)),
+    "lower": _string_method("lower"),
+    "upper": _string_method("upper"),
+    "contains": lambda series, text: _string_method("contains")(series, str(text), False, regex=False),
+    "startswith": lambda series, text: _string_method("startswith")(series, str(text)),
+    "endswith": lambda series, text: _string_method("endswith")(series, str(text)),
+    # Missing values are stored as empty strings
+    "isnull": lambda series: series.isna() | (series == ''),
+    "notnull": lambda series: ~(series.isna() | (series == '')),
+}
+
+
+class _Compiler:
+    """Turns a whitelisted AST into a closure taking a DataFrame"""
+
+    def __init__(self, names: Dict[str, str]):
+        self.names = names  # placeholder identifier -> column name
+        self.columns: List[str] = []
+        self.nodes = 0
+
+    def column(self, name: str) -> str:
+        column = self.names.get(name, name)
+        if column not in self.columns:
+            self.columns.append(column)
+        return column
+
+    def compile(self, node):
+        self.nodes += 1
+        if self.nodes > MAX_EXPRESSION_NODES:
+            raise ExpressionError("Expression is too complex")
+        method = getattr(self, f"visit_{type(node).__name__}", None)
+        if method is None:
+            raise ExpressionError(f"Unsupported syntax: {type(node).__name__}")
+        return method(node)
+
+    def visit_Expression(self, node):
+        return self.compile(node.body)
+
+    def visit_Constant(self, node):
+        value = node.value
+        if not isinstance(value, (int, float, str, bool)) and value is not None:
+            raise ExpressionError(f"Unsupported constant: {value!r}")
+        return lambda df: value
+
+    def visit_Name(self, node):
+        if node.id in ("true", "false"):
+            value = node.id == "true"
+            return lambda df: value
+        column = self.column(node.id)
+        return lambda df: df[column]
+
+    def visit_List(self, node):
+        items = []
+        for element in node.elts:
+            if not isinstance(element, ast.Constant):
+                raise ExpressionError("Lists may only contain constants")
+            items.append(element.value)
+        return lambda df: items
+
+    visit_Tuple = visit_List
+
+    def visit_UnaryOp(self, node):
+        operand = self.compile(node.operand)
+        if isinstance(node.op, ast.Not):
+            def negate(df):
+                mask = _as_mask(operand(df))
+                return ~mask if isinstance(mask, pd.Series) else not mask
+            return negate
+        if isinstance(node.op, ast.USub):
+            return lambda df: -_numeric(operand(df))
+        if isinstance(node.op, ast.UAdd):
+            return lambda df: _numeric(operand(df))
+        raise ExpressionError("Unsupported unary operator")
+
+    def visit_BinOp(self, node):
+        op = BINARY_OPS.get(type(node.op))
+        if op is None:
+            raise ExpressionError("Unsupported operator")
+        left, right = self.compile(node.left), self.compile(node.right)
+        return lambda df: op(_numeric(left(df)), _numeric(right(df)))
+
+    def visit_BoolOp(self, node):
+        values = [self.compile(value) for value in node.values]
+        combine = operator.and_ if isinstance(node.op, ast.And) else operator.or_
+
+        def evaluate(df):
+            result = _as_mask(values[0](df))
+            for value in values[1:]:
+                result = combine(result, _as_mask(value(df)))
+            return result
+        return evaluate
+
+    def visit_Compare(self, node):
+        operands = [self.compile(node.left)] + [self.compile(c) for c in node.comparators]
+        ops = []
+        for op in node.ops:
+            if isinstance(op, (ast.In, ast.NotIn)):
+                ops.append(op)
+            elif type(op) in COMPARE_OPS:
+                ops.append(COMPARE_OPS[type(op)])
+            else:
+                raise ExpressionError("Unsupported comparison")
+
+        def evaluate(df):
+            values = [operand(df) for operand in operands]
+            result = None
+            # a < b < c means a < b and b < c
+            for op, left, right in zip(ops, values, values[1:]):
+                if isinstance(op, (ast.In, ast.NotIn)):
+                    if not isinstance(left, pd.Series) or not isinstance(right, list):
+                        raise ExpressionError("'in' needs a column on the left and a list on the right")
+                    part = left.isin(right) | left.astype(str).isin([str(v) for v in right])
+                    part = ~part if isinstance(op, ast.NotIn) else part
+                else:
+                    part = _compare(op, left, right)
+                part = _as_mask(part)
+                result = part if result is None else result & part
+            return result
+        return evaluate
+
+    def visit_IfExp(self, node):
+        test, body, orelse = self.compile(node.test), self.compile(node.body), self.compile(node.orelse)
+
+        def evaluate(df):
+            mask = _as_mask(test(df))
+            if not isinstance(mask, pd.Series):
+                return body(df) if mask else orelse(df)
+            return pd.Series(np.where(mask, _broadcast(body(df), df), _broadcast(orelse(df), df)), index=df.index)
+        return evaluate
+
+    def visit_Call(self, node):
+        if not isinstance(node.func, ast.Name) or node.func.id not in FUNCTIONS or node.keywords:
+            raise ExpressionError(f"Unknown function; available: {', '.join(sorted(FUNCTIONS))}")
+        function = FUNCTIONS[node.func.id]
+        args = [self.compile(arg) for arg in node.args]
+
+        def evaluate(df):
+            try:
+                return function(*[arg(df) for arg in args])
+            except TypeError:
+                raise ExpressionError(f"Wrong arguments for {node.func.id}()")
+        return evaluate
+
+
+def _as_mask(value):
+    if isinstance(value, pd.Series):
+        if pd.api.types.is_bool_dtype(value):
+            return value.fillna(False).astype(bool)
+        raise ExpressionError("Expected a condition, got a column of values")
+    return bool(value)
+
+
+def _broadcast(value, df: pd.DataFrame):
+    return value.to_numpy() if isinstance(value, pd.Series) else np.full(len(df), value, dtype=object)
+
+
+class CompiledExpression:
+    """A parsed expression with the columns it reads"""
+
+    def __init__(self, text: str, evaluate: Callable, columns: List[str]):
+        self.text = text
+        self.columns = columns
+        self._evaluate = evaluate
+
+    def evaluate(self, df: pd.DataFrame):
+        missing = [c for c in self.columns if c not in df.columns]
+        if missing:
+            raise ExpressionError(f"Unknown column(s) in expression: {missing}")
+        try:
+            # Overflow and division by zero give inf/NaN like any float column
+            with np.errstate(all="ignore"):
+                return self._evaluate(df)
+        except ExpressionError:
+            raise
+        except Exception as e:
+            raise ExpressionError(f"Could not evaluate '{self.text}': {e}")
+
+    def mask(self, df: pd.DataFrame) -> pd.Series:
+        """Evaluate as a row filter"""
+        result = _as_mask(self.evaluate(df))
+        if isinstance(result, pd.Series):
+            return result
+        return pd.Series(result, index=df.index)
+
+    def values(self, df: pd.DataFrame) -> pd.Series:
+        """Evaluate as a derived column"""
+        result = self.evaluate(df)
+        if isinstance(result, pd.Series):
+            return result
+        return pd.Series(_broadcast(result, df), index=df.index)
+
+
+@lru_cache(maxsize=EXPRESSION_CACHE_SIZE)
+def compile_expression(text: str) -> CompiledExpression:
+    """Parse and compile an expression; results are cached by text"""
+    if len(text) > MAX_EXPRESSION_LENGTH:
+        raise ExpressionError(f"Expression is longer than {MAX_EXPRESSION_LENGTH} characters")
+
+    # Backtick-quoted column names become placeholder identifiers
+    names = {}
+
+    def placeholder(match):
+        name = f"__column_{len(names)}"
+        names[name] = match.group(1)
+        return name
+    source = _BACKTICK.sub(placeholder, text)
+
+    try:
+        tree = ast.parse(source.strip(), mode="eval")
+    except SyntaxError as e:
+        raise ExpressionError(f"Invalid expression '{text}': {e.msg}")
+    compiler = _Compiler(names)
+    return CompiledExpression(text, compiler.compile(tree), compiler.columns)
+
+
+def parse_derived(definitions: Optional[List[str]]) -> List[Tuple[str, CompiledExpression]]:
+    """Parse `name=expression` definitions of derived columns"""
+    derived = []
+    for definition in definitions or []:
+        name, sep, text = definition.partition("=")
+        name = name.strip().strip("`")
+        if not sep or not name or text.startswith("="):
+            raise ExpressionError(f"Derived columns are written as name=expression, got '{definition}'")
+        derived.append((name, compile_expression(text.strip())))
+    return derived
+
+
+class RowTransform:
+    """Derived columns followed by a row filter, applied to DataFrames"""
+
+    def __init__(self, filter_text: Optional[str] = None, derive: Optional[List[str]] = None):
+        self.derived = parse_derived(derive)
+        self.filter = compile_expression(filter_text.strip()) if filter_text and filter_text.strip() else None
+
+    def __bool__(self):
+        return bool(self.derived or self.filter)
+
+    @property
+    def derived_names(self) -> List[str]:
+        return [name for name, _ in self.derived]
+
+    def source_columns(self, columns: List[str]) -> List[str]:
+        """Stored columns needed to produce `columns` and apply the filter
+
+        Each derived column sees the ones defined before it, so a derived
+        column may replace a stored column it reads (price=price * 2).
+        """
+        needed = [c for c in columns if c not in self.derived_names]
+        defined = set()
+        for name, expression in self.derived:
+            needed.extend(c for c in expression.columns if c not in defined)
+            defined.add(name)
+        if self.filter:
+            needed.extend(c for c in self.filter.columns if c not in defined)
+        return list(dict.fromkeys(needed))
+
+    def derive(self, df: pd.DataFrame) -> pd.DataFrame:
+        if not self.derived:
+            return df
+        df = df.copy(deep=False)
+        for name, expression in self.derived:
+            df[name] = expression.values(df)
+        return df
+
+    def mask(self, df: pd.DataFrame) -> Optional[pd.Series]:
+        return self.filter.mask(df) if self.filter else None
+
+    def apply(self, df: pd.DataFrame, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """Derive, then keep only matching rows (and, with `columns`, only what they need)"""
+        if columns is not None:
+            source = self.source_columns(columns)
+            missing = [c for c in source if c not in df.columns]
+            if missing:
+                raise ExpressionError(f"Unknown column(s) in expression: {missing}")
+            df = df[source]
+        df = self.derive(df)
+        mask = self.mask(df)
+        return df if mask is None else df[mask]
+
+
+def expression_cache_stats() -> dict:
+    info = compile_expression.cache_info()
+    return {"hits": info.hits, "misses": info.misses, "size": info.currsize, "max_size": info.maxsize}
@@ -0,0 +1,119 @@
+"""
+Per-process cache of hot DataFrames
+Keeps recently used datasets materialized in this worker, keyed by dataset id
+and checked against the dataset version, so repeated charts on the same
+dataset skip decoding entirely. Entries are evicted least recently used first
+once the memory they own exceeds HOT_CACHE_BYTES.
+
+Frames come from the node-wide shared cache and are kept as they are, backed
+by its memory mapping, so a hot dataset is still held once per node. Entries
+are charged only their private bytes (decoded text columns), not the mapped
+ones. The shared entry is released as soon as the frame is cached: an
+evicted entry's files are unlinked, but the mapping stays valid (on POSIX)
+until this worker drops the frame. Entries are keyed by dataset version: a
+lookup with a newer version drops the stale frame, whichever worker handled
+the change. Deleted datasets are never looked up again and age out.
+"""
+import os
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+
+from starlette.concurrency import run_in_threadpool
+
+from shared_cache import dataset_cache
+
+HOT_CACHE_BYTES = int(os.getenv("HOT_CACHE_BYTES", str(512 << 20)))
+
+
+def _frame_bytes(df) -> int:
+    """Memory this worker owns for a frame; shared-cache frames report it themselves"""
+    private = df.attrs.get("private_bytes")
+    if private is not None:
+        return private
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class HotFrameCache:
+    """LRU cache of whole-dataset DataFrames with a byte budget"""
+
+    def __init__(self, budget: int = HOT_CACHE_BYTES):
+        self.budget = budget
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # dataset_id -> (version, DataFrame, size)
+        self._entries = OrderedDict()
+
+    def _pop(self, key):
+        _, _, size = self._entries.pop(key)
+        self.bytes -= size
+
+    def get(self, dataset: dict):
+        key = str(dataset["_id"])
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] != dataset.get("version", 1):
+            self._pop(key)  # Appended to since it was cached
+            return None
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, dataset: dict, df, size: int) -> bool:
+        """Cache a frame, evicting older ones to fit; False if it can never fit"""
+        if size > self.budget:
+            return False
+        key = str(dataset["_id"])
+        if key in self._entries:
+            self._pop(key)
+        while self._entries and self.bytes + size > self.budget:
+            self._pop(next(iter(self._entries)))
+            self.evictions += 1
+        self._entries[key] = (dataset.get("version", 1), df, size)
+        self.bytes += size
+        return True
+
+    def invalidate(self, dataset_id):
+        """Forget a dataset in this worker (e.g. after it is deleted)"""
+        if str(dataset_id) in self._entries:
+            self._pop(str(dataset_id))
+
+    @asynccontextmanager
+    async def frame(self, dataset: dict):
+        """Yield the whole dataset as a DataFrame; do not modify it in place"""
+        df = self.get(dataset)
+        if df is not None:
+            self.hits += 1
+            yield df
+            return
+
+        self.misses += 1
+        df, release = await dataset_cache.pin(dataset)
+        try:
+            size = await run_in_threadpool(_frame_bytes, df)
+        except BaseException:
+            release()
+            raise
+        if self.put(dataset, df, size):
+            # The mapping outlives the entry's files, so no pin is needed
+            release()
+            yield df
+            return
+        try:
+            yield df
+        finally:
+            release()
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "budget_bytes": self.budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+hot_frames = HotFrameCache()
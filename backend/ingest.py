@@ -0,0 +1,348 @@
+"""
+File ingestion pipeline
+Parses uploaded CSV/Excel files into DataFrame batches and streams them into
+chunked row storage. Parsing is blocking, so it runs in the threadpool and
+the event loop stays free while large files are processed.
+"""
+import os
+import tempfile
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Optional
+
+import pandas as pd
+from bson import ObjectId
+from fastapi import UploadFile
+from pymongo import ReturnDocument
+from openpyxl import load_workbook
+from starlette.concurrency import run_in_threadpool
+
+from csv_parallel import iter_csv_ranges, parallel_csv_enabled, split_records
+from database import get_datasets_collection
+from sampling import Reservoir, load_sample, save_sample
+from sketches import SketchSet
+from storage import (
+    CHUNK_SIZE, STORAGE_CHUNKED, DatasetWriter, SchemaMismatchError,
+    delete_rows, is_chunked, truncate_rows
+)
+
+ALLOWED_EXTENSIONS = ['.csv', '.xlsx', '.xls']
+STREAMING_EXCEL_EXTENSIONS = ['.xlsx']
+SPOOL_BLOCK_SIZE = 1024 * 1024
+APPEND_LOCK_TIMEOUT = timedelta(hours=1)
+
+
+class IngestError(Exception):
+    """Raised when an uploaded file cannot be parsed"""
+
+
+class AppendConflict(Exception):
+    """Raised when a dataset cannot be appended to right now"""
+
+
+async def spool_upload(file: UploadFile, file_ext: str) -> str:
+    """Copy an upload to a temporary file on disk and return its path"""
+    spooled = tempfile.NamedTemporaryFile(delete=False, suffix=file_ext, prefix="dataviz_upload_")
+    try:
+        while True:
+            block = await file.read(SPOOL_BLOCK_SIZE)
+            if not block:
+                break
+            await run_in_threadpool(spooled.write, block)
+    finally:
+        spooled.close()
+    return spooled.name
+
+
+def remove_spooled(path: str):
+    """Delete a spooled upload, ignoring files that are already gone"""
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _excel_columns(header) -> list:
+    """Name header cells the way pandas does (Unnamed: i, dup, dup.1)"""
+    columns = []
+    seen = {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if value is None else str(value)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        columns.append(name)
+    return columns
+
+
+def _select_worksheet(workbook, sheet: Optional[str]):
+    """Pick a worksheet by name or zero-based index, defaulting to the first"""
+    if sheet is None or sheet == "":
+        return workbook.worksheets[0]
+    if sheet in workbook.sheetnames:
+        return workbook[sheet]
+    if sheet.isdigit() and int(sheet) < len(workbook.worksheets):
+        return workbook.worksheets[int(sheet)]
+    raise IngestError(f"Worksheet '{sheet}' not found")
+
+
+def iter_excel_batches(path: str, sheet: Optional[str] = None, header_row: int = 1):
+    """Stream an .xlsx file row by row in read-only mode, yielding DataFrame batches
+
+    Unlike pd.read_excel, this never builds openpyxl's full object model, so
+    memory stays proportional to CHUNK_SIZE rather than to the workbook.
+    """
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        worksheet = _select_worksheet(workbook, sheet)
+        rows = worksheet.iter_rows(min_row=header_row, values_only=True)
+
+        header = list(next(rows, None) or [])
+        # Read-only sheets often report padding cells past the last header
+        while header and header[-1] is None:
+            header.pop()
+        if not header:
+            raise IngestError("No columns to parse from file")
+
+        columns = _excel_columns(header)
+        width = len(columns)
+        batch = []
+        yielded = False
+        for row in rows:
+            if all(value is None for value in row):
+                continue  # pandas skips blank rows too
+            row = list(row[:width])
+            row.extend([None] * (width - len(row)))
+            batch.append(row)
+            if len(batch) >= CHUNK_SIZE:
+                yield pd.DataFrame(batch, columns=columns)
+                yielded = True
+                batch = []
+
+        if batch or not yielded:
+            yield pd.DataFrame(batch, columns=columns)
+    finally:
+        workbook.close()
+
+
+def open_file_batches(path: str, file_ext: str, sheet: Optional[str] = None, header_row: int = 1):
+    """Return an iterator of DataFrame batches for a spooled file
+
+    `sheet` and `header_row` (1-based) only apply to Excel files.
+    """
+    if file_ext == '.csv':
+        return iter(pd.read_csv(path, chunksize=CHUNK_SIZE))
+
+    if file_ext in STREAMING_EXCEL_EXTENSIONS:
+        return iter_excel_batches(path, sheet, header_row)
+
+    # Legacy .xls has no streaming reader, so it is parsed in one go
+    sheet_name = int(sheet) if sheet and sheet.isdigit() else (sheet or 0)
+    df = pd.read_excel(path, sheet_name=sheet_name, header=header_row - 1)
+    return (df.iloc[i:i + CHUNK_SIZE] for i in range(0, max(len(df), 1), CHUNK_SIZE))
+
+
+def _next_batch(batches):
+    try:
+        return next(batches, None)
+    except IngestError:
+        raise
+    except Exception as e:
+        raise IngestError(str(e)) from e
+
+
+async def iter_file_batches(path: str, file_ext: str, **options):
+    """Asynchronously yield parsed DataFrame batches without blocking the loop
+
+    Large CSV files are split on record boundaries and parsed in a process
+    pool; everything else is parsed sequentially in the threadpool.
+    """
+    if file_ext == '.csv' and parallel_csv_enabled(path):
+        split = await run_in_threadpool(split_records, path)
+        if split is not None:
+            try:
+                async for df in iter_csv_ranges(path, split, CHUNK_SIZE):
+                    yield df
+            except IngestError:
+                raise
+            except Exception as e:
+                raise IngestError(str(e)) from e
+            return
+
+    try:
+        batches = await run_in_threadpool(open_file_batches, path, file_ext, **options)
+    except IngestError:
+        raise
+    except Exception as e:
+        raise IngestError(str(e)) from e
+
+    while True:
+        df = await run_in_threadpool(_next_batch, batches)
+        if df is None:
+            break
+        yield df
+
+
+async def store_dataset(
+    batches,
+    filename: str,
+    user_email: str,
+    file_size: int,
+    on_progress: Optional[Callable[[int], Awaitable[None]]] = None,
+    extra_fields: Optional[dict] = None
+) -> dict:
+    """Write an async stream of DataFrame batches as a new dataset
+
+    The dataset document is inserted only after every chunk is written, so a
+    half-ingested dataset never shows up in listings. On failure the chunks
+    written so far are removed again.
+    """
+    dataset_id = ObjectId()
+    writer = DatasetWriter(dataset_id)
+
+    try:
+        async for df in batches:
+            await writer.write(df)
+            if on_progress:
+                await on_progress(writer.row_count)
+
+        if writer.columns is None:
+            raise IngestError("No columns to parse from file")
+        await save_sample(dataset_id, writer.reservoir)
+
+        dataset_doc = {
+            "_id": dataset_id,
+            "filename": filename,
+            "user_email": user_email,
+            "upload_date": datetime.utcnow(),
+            "row_count": writer.row_count,
+            "column_count": len(writer.columns),
+            "columns": writer.columns,
+            "file_size": file_size,
+            "storage": STORAGE_CHUNKED,
+            "version": 1,
+            "chunk_count": writer.next_seq,
+            "sketches": writer.sketches.to_docs(),
+            **(extra_fields or {}),
+        }
+
+        datasets = get_datasets_collection()
+        await datasets.insert_one(dataset_doc)
+    except BaseException:
+        await delete_rows(dataset_id)
+        raise
+
+    return dataset_doc
+
+
+async def ingest_file(
+    path: str,
+    file_ext: str,
+    filename: str,
+    user_email: str,
+    on_progress: Optional[Callable[[int], Awaitable[None]]] = None,
+    **options
+) -> dict:
+    """Parse a spooled file into chunked storage and create its dataset document
+
+    Extra options (sheet, header_row) are passed through to the parser.
+    """
+    return await store_dataset(
+        iter_file_batches(path, file_ext, **options),
+        filename,
+        user_email,
+        os.path.getsize(path),
+        on_progress
+    )
+
+
+async def append_file(
+    dataset: dict,
+    path: str,
+    file_ext: str,
+    **options
+) -> dict:
+    """Append the rows of a spooled file to an existing chunked dataset
+
+    The new rows go through the same writer as an upload, resumed from the
+    dataset's stored row count, reservoir sample and column sketches, so the
+    cost is proportional to the new rows only. Appends to one dataset are
+    serialized with a lock on its document; readers only see the new rows
+    once `row_count` is updated at the end.
+    """
+    if not is_chunked(dataset):
+        raise AppendConflict("Dataset was stored before appends were supported; re-upload it first")
+
+    datasets = get_datasets_collection()
+    dataset_id = dataset["_id"]
+    now = datetime.utcnow()
+    locked = await datasets.find_one_and_update(
+        {
+            "_id": dataset_id,
+            "$or": [
+                {"append_locked_at": None},
+                {"append_locked_at": {"$lt": now - APPEND_LOCK_TIMEOUT}},
+            ],
+        },
+        {"$set": {"append_locked_at": now}},
+        projection={"row_count": 1, "chunk_count": 1, "columns": 1, "sketches": 1, "version": 1}
+    )
+    if locked is None:
+        raise AppendConflict("Another append to this dataset is in progress")
+
+    start_row = locked["row_count"]
+    try:
+        # Chunks past row_count are left over from an append that crashed or
+        # whose lock was taken over; they would be read twice after commit
+        await truncate_rows(dataset_id, start_row)
+        sample_doc = await load_sample(dataset_id)
+        writer = DatasetWriter(
+            dataset_id,
+            start_row=start_row,
+            next_seq=locked.get("chunk_count", 0),
+            columns=locked["columns"],
+            reservoir=Reservoir(
+                rows=sample_doc["rows"] if sample_doc else [],
+                seen=sample_doc["population"] if sample_doc else 0
+            ),
+            sketches=SketchSet.from_docs(locked.get("sketches")),
+        )
+
+        try:
+            async for df in iter_file_batches(path, file_ext, **options):
+                await writer.write(df)
+        except SchemaMismatchError as e:
+            raise IngestError(str(e)) from e
+
+        updated = await datasets.find_one_and_update(
+            {"_id": dataset_id},
+            {
+                "$set": {
+                    "row_count": writer.row_count,
+                    "chunk_count": writer.next_seq,
+                    "sketches": writer.sketches.to_docs(),
+                    "version": locked.get("version", 1) + 1,
+                    "last_appended_at": datetime.utcnow(),
+                },
+                "$inc": {"file_size": os.path.getsize(path)},
+                "$unset": {"append_locked_at": ""},
+            },
+            projection={"row_count": 1, "version": 1},
+            return_document=ReturnDocument.AFTER
+        )
+        if updated is None:
+            raise AppendConflict("Dataset was deleted during the append")
+    except BaseException:
+        await truncate_rows(dataset_id, start_row)
+        await datasets.update_one({"_id": dataset_id}, {"$unset": {"append_locked_at": ""}})
+        raise
+
+    # Only published once the new rows are committed
+    await save_sample(dataset_id, writer.reservoir)
+
+    return {
+        "rows_added": writer.rows_written,
+        "total_rows": updated["row_count"],
+        "version": updated["version"],
+    }
@@ -0,0 +1,158 @@
+"""
+Background ingestion jobs
+`POST /upload/jobs` spools the file to disk and returns a job id right away.
+A fixed pool of worker tasks parses and stores queued files, so at most
+INGEST_WORKERS files are ingested concurrently per process. Progress lives in
+the ingest_jobs collection, so any API worker can answer status polls.
+"""
+import asyncio
+import os
+from datetime import datetime
+from typing import Optional
+
+from bson import ObjectId
+
+from admission import upload_admission
+from database import get_ingest_jobs_collection
+from ingest import IngestError, ingest_file, remove_spooled
+from saved_charts import applicable_chart_definitions, materialize_saved_charts
+
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_QUEUE_SIZE = int(os.getenv("INGEST_QUEUE_SIZE", "100"))
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_COMPLETED = "completed"
+JOB_FAILED = "failed"
+
+
+class IngestQueueFull(Exception):
+    """Raised when no more jobs can be queued"""
+
+
+async def _update_job(job_id: ObjectId, fields: dict):
+    jobs = get_ingest_jobs_collection()
+    fields["updated_at"] = datetime.utcnow()
+    if fields.get("status") in (JOB_COMPLETED, JOB_FAILED):
+        fields["finished_at"] = fields["updated_at"]  # Starts the expiry clock
+    await jobs.update_one({"_id": job_id}, {"$set": fields})
+
+
+async def run_ingest_job(job: dict):
+    """Parse and store one queued upload, recording progress on the job
+
+    Jobs share the upload admission limits with direct uploads; a job stays
+    queued until it gets a slot rather than being rejected. Once the job is
+    completed, the owner's saved charts are computed for the new dataset.
+    """
+    job_id = job["_id"]
+    dataset_doc = None
+
+    async def on_progress(rows: int):
+        await _update_job(job_id, {"rows_processed": rows})
+
+    try:
+        async with upload_admission.slot(job["user_email"], wait=True):
+            await _update_job(job_id, {"status": JOB_RUNNING})
+            stored = await ingest_file(
+                job["path"], job["file_ext"], job["filename"], job["user_email"], on_progress,
+                **job["options"]
+            )
+        await _update_job(job_id, {
+            "status": JOB_COMPLETED,
+            "rows_processed": stored["row_count"],
+            "dataset_id": str(stored["_id"]),
+        })
+        dataset_doc = stored
+    except asyncio.CancelledError:
+        await _update_job(job_id, {"status": JOB_FAILED, "error": "Server shut down during processing"})
+        raise
+    except IngestError as e:
+        await _update_job(job_id, {"status": JOB_FAILED, "error": f"Error parsing file: {e}"})
+    except Exception as e:
+        await _update_job(job_id, {"status": JOB_FAILED, "error": f"Error storing dataset: {e}"})
+    finally:
+        remove_spooled(job["path"])
+
+    if dataset_doc is not None:
+        try:
+            await materialize_saved_charts(dataset_doc, await applicable_chart_definitions(dataset_doc))
+        except Exception as e:
+            # Missing results are computed when the dashboard first asks for them
+            print(f"⚠️ Warning: Could not materialize saved charts: {e}")
+
+
+class IngestJobQueue:
+    """Bounded queue of ingestion jobs drained by a fixed number of workers"""
+
+    def __init__(self, workers: int = INGEST_WORKERS, maxsize: int = INGEST_QUEUE_SIZE):
+        self.workers = workers
+        self.maxsize = maxsize
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks = []
+
+    async def start(self):
+        self._queue = asyncio.Queue(maxsize=self.maxsize)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+        # Anything still queued will never run in this process
+        while self._queue and not self._queue.empty():
+            job = self._queue.get_nowait()
+            await _update_job(job["_id"], {"status": JOB_FAILED, "error": "Server shut down before processing"})
+            remove_spooled(job["path"])
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    async def submit(self, path: str, file_ext: str, filename: str, user_email: str,
+                     options: Optional[dict] = None) -> str:
+        """Record a job and queue it for the workers; returns the job id"""
+        if self._queue is None or self._queue.full():
+            raise IngestQueueFull()
+
+        now = datetime.utcnow()
+        job_doc = {
+            "user_email": user_email,
+            "filename": filename,
+            "file_size": os.path.getsize(path),
+            "status": JOB_QUEUED,
+            "rows_processed": 0,
+            "dataset_id": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        jobs = get_ingest_jobs_collection()
+        result = await jobs.insert_one(job_doc)
+
+        # The spool path is local to this process, so it is not persisted
+        try:
+            self._queue.put_nowait({
+                **job_doc,
+                "_id": result.inserted_id,
+                "path": path,
+                "file_ext": file_ext,
+                "options": options or {},
+            })
+        except asyncio.QueueFull:
+            await _update_job(result.inserted_id, {"status": JOB_FAILED, "error": "Ingest queue is full"})
+            raise IngestQueueFull()
+        return str(result.inserted_id)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await run_ingest_job(job)
+            finally:
+                self._queue.task_done()
+
+
+ingest_queue = IngestJobQueue()
@@ -0,0 +1,206 @@
+"""
+Hash join engine for combining two datasets
+The smaller dataset is loaded (only the columns the join needs) and its keys
+are factorized into a hash index. The larger dataset is then streamed chunk
+by chunk and probed against that index, so memory is bounded by the build
+side plus one chunk. CPU work runs in a dedicated thread pool.
+"""
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from storage import iter_row_chunks, with_inline_rows
+
+JOIN_WORKERS = int(os.getenv("JOIN_WORKERS", "4"))
+JOIN_MAX_BUILD_ROWS = int(os.getenv("JOIN_MAX_BUILD_ROWS", "5000000"))
+JOIN_HOW = ("inner", "left")
+
+join_executor = ThreadPoolExecutor(max_workers=JOIN_WORKERS, thread_name_prefix="join")
+
+
+class JoinError(ValueError):
+    """Raised for joins that cannot be run as requested"""
+
+
+def _key_index(frame: pd.DataFrame, keys: List[str]) -> pd.Index:
+    if len(keys) == 1:
+        return pd.Index(frame[keys[0]])
+    return pd.MultiIndex.from_frame(frame[keys])
+
+
+def _null_keys(frame: pd.DataFrame, keys: List[str]) -> np.ndarray:
+    """Rows with a missing key value (stored as '') never match"""
+    mask = np.zeros(len(frame), dtype=bool)
+    for key in keys:
+        mask |= (frame[key].isna() | (frame[key] == '')).to_numpy()
+    return mask
+
+
+class HashTable:
+    """Build-side rows grouped by factorized join key"""
+
+    def __init__(self, frame: pd.DataFrame, keys: List[str]):
+        self.frame = frame.reset_index(drop=True)
+        codes, uniques = pd.factorize(_key_index(self.frame, keys))
+        codes[_null_keys(self.frame, keys)] = -1
+        self.index = pd.Index(uniques)
+
+        valid = codes >= 0
+        rows = np.flatnonzero(valid)
+        # Row positions sorted by key code, plus where each code's run starts
+        self.order = rows[np.argsort(codes[valid], kind="stable")]
+        self.counts = np.bincount(codes[valid], minlength=len(self.index))
+        self.starts = np.concatenate([[0], np.cumsum(self.counts)[:-1]]) if len(self.counts) else self.counts
+        self.matched = np.zeros(len(self.frame), dtype=bool)
+
+    def probe(self, frame: pd.DataFrame, keys: List[str]):
+        """Return (probe_positions, build_positions) of every matching pair"""
+        if not len(self.index) or frame.empty:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        codes = self.index.get_indexer(_key_index(frame, keys))
+        codes[_null_keys(frame, keys)] = -1
+
+        hits = np.flatnonzero(codes >= 0)
+        per_row = self.counts[codes[hits]]
+        probe_pos = np.repeat(hits, per_row)
+        # Offset of each output pair within its key's run of build rows
+        run_start = np.repeat(np.cumsum(per_row) - per_row, per_row)
+        offsets = np.arange(len(probe_pos)) - run_start
+        build_pos = self.order[np.repeat(self.starts[codes[hits]], per_row) + offsets]
+        self.matched[build_pos] = True
+        return probe_pos, build_pos
+
+
+class HashJoin:
+    """Join plan for two datasets; the smaller one is the build side"""
+
+    def __init__(self, left: dict, right: dict, left_on: List[str], right_on: List[str],
+                 how: str = "inner", left_columns: Optional[List[str]] = None,
+                 right_columns: Optional[List[str]] = None):
+        if how not in JOIN_HOW:
+            raise JoinError(f"Join type must be one of {', '.join(JOIN_HOW)}")
+        if not left_on or len(left_on) != len(right_on):
+            raise JoinError("left_on and right_on must name the same number of key columns")
+
+        if left_columns is None:
+            left_columns = list(left["columns"])
+        if right_columns is None:
+            # Right-side keys would only repeat the left-side keys
+            right_columns = [c for c in right["columns"] if c not in right_on]
+
+        for dataset, names in ((left, left_on + left_columns), (right, right_on + right_columns)):
+            unknown = [c for c in names if c not in dataset["columns"]]
+            if unknown:
+                raise JoinError(f"Columns not found in dataset '{dataset['filename']}': {unknown}")
+
+        self.left, self.right = left, right
+        self.left_on, self.right_on = left_on, right_on
+        self.how = how
+        self.left_columns, self.right_columns = left_columns, right_columns
+
+        # Output names: right-side columns get a suffix when they collide
+        self.right_names = [
+            f"{c}_right" if c in left_columns else c for c in right_columns
+        ]
+        self.columns = left_columns + self.right_names
+
+        self.build_left = left["row_count"] <= right["row_count"]
+        build = left if self.build_left else right
+        if build["row_count"] > JOIN_MAX_BUILD_ROWS:
+            raise JoinError(
+                f"Both datasets exceed {JOIN_MAX_BUILD_ROWS} rows; the smaller side must fit in memory"
+            )
+
+    def _side_columns(self, is_left: bool) -> List[str]:
+        keys, columns = (self.left_on, self.left_columns) if is_left else (self.right_on, self.right_columns)
+        return list(dict.fromkeys(keys + columns))
+
+    async def _load_frame(self, dataset: dict, columns: List[str]) -> pd.DataFrame:
+        records = []
+        async for rows in iter_row_chunks(await with_inline_rows(dataset), columns):
+            records.extend(rows)
+        return pd.DataFrame(records, columns=columns)
+
+    def _assemble(self, left: pd.DataFrame, right: pd.DataFrame) -> pd.DataFrame:
+        out = left[self.left_columns].reset_index(drop=True)
+        right = right[self.right_columns].reset_index(drop=True)
+        right.columns = self.right_names
+        return pd.concat([out, right], axis=1)
+
+    def _join_chunk(self, table: HashTable, probe: pd.DataFrame) -> pd.DataFrame:
+        probe_keys = self.right_on if self.build_left else self.left_on
+        probe_pos, build_pos = table.probe(probe, probe_keys)
+
+        if self.build_left:
+            return self._assemble(table.frame.iloc[build_pos], probe.iloc[probe_pos])
+
+        joined = self._assemble(probe.iloc[probe_pos], table.frame.iloc[build_pos])
+        if self.how == "left":
+            # Probe side is the left side: keep its rows without a match
+            unmatched = np.setdiff1d(np.arange(len(probe)), probe_pos)
+            if len(unmatched):
+                lonely = probe.iloc[unmatched][self.left_columns].reset_index(drop=True)
+                lonely = lonely.reindex(columns=self.columns, fill_value='')
+                joined = pd.concat([joined, lonely], ignore_index=True)
+        return joined
+
+    def _unmatched_build_rows(self, table: HashTable) -> pd.DataFrame:
+        lonely = table.frame.loc[~table.matched, self.left_columns].reset_index(drop=True)
+        return lonely.reindex(columns=self.columns, fill_value='')
+
+    async def run(self):
+        """Asynchronously yield joined DataFrame batches in a deterministic order"""
+        loop = asyncio.get_running_loop()
+        build, probe = (self.left, self.right) if self.build_left else (self.right, self.left)
+        build_columns = self._side_columns(self.build_left)
+        probe_columns = self._side_columns(not self.build_left)
+
+        build_frame = await self._load_frame(build, build_columns)
+        build_keys = self.left_on if self.build_left else self.right_on
+        table = await loop.run_in_executor(join_executor, HashTable, build_frame, build_keys)
+
+        async for rows in iter_row_chunks(await with_inline_rows(probe), probe_columns):
+            chunk = pd.DataFrame(rows, columns=probe_columns)
+            joined = await loop.run_in_executor(join_executor, self._join_chunk, table, chunk)
+            if not joined.empty:
+                yield joined
+
+        if self.how == "left" and self.build_left:
+            lonely = await loop.run_in_executor(join_executor, self._unmatched_build_rows, table)
+            if not lonely.empty:
+                yield lonely
+
+    async def materialized_batches(self):
+        """Joined batches for storing as a dataset; always sets the columns"""
+        async for batch in self.run():
+            yield batch
+        # An empty batch still fixes the schema when nothing matched
+        yield pd.DataFrame(columns=self.columns)
+
+    async def page(self, offset: int, limit: int) -> dict:
+        """Return `limit` joined rows starting at `offset`, stopping the probe early"""
+        rows = []
+        seen = 0
+        has_more = False
+        batches = self.run()
+        try:
+            async for batch in batches:
+                if seen + len(batch) > offset and len(rows) < limit:
+                    start = max(offset - seen, 0)
+                    rows.extend(batch.iloc[start:start + limit - len(rows)].to_dict('records'))
+                seen += len(batch)
+                if seen > offset + limit:
+                    has_more = True
+                    break
+        finally:
+            await batches.aclose()
+        return {
+            "data": rows,
+            "has_more": has_more,
+            # The full result size is only known when the probe ran to the end
+            "total_rows": None if has_more else seen,
+        }
@@ -1,15 +1,22 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, BackgroundTasks, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
-from datetime import datetime, timedelta
-from typing import Optional
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
 from bson import ObjectId
 import jwt
 import bcrypt
 import pandas as pd
-import io
+import base64
+import hashlib
+import json
 import os
+import time
 from pydantic import BaseModel, EmailStr
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import UploadFile as FormFile
 
 # Import database configuration
 from database import (
@@ -17,13 +24,60 @@ from database import (
     close_mongodb_connection,
     get_users_collection,
     get_datasets_collection,
+    get_ingest_jobs_collection,
+    get_chart_definitions_collection,
+    get_chart_results_collection,
     create_indexes
 )
+from ingest import (
+    ALLOWED_EXTENSIONS, AppendConflict, IngestError,
+    append_file, ingest_file, store_dataset, spool_upload, remove_spooled
+)
+from jobs import JOB_QUEUED, IngestQueueFull, ingest_queue
+from storage import clean_frame, fetch_rows, iter_row_chunks, load_dataframe, with_inline_rows
+from sketches import ColumnSketch, SketchSet
+from shared_cache import dataset_cache
+from frame_cache import hot_frames
+from expressions import ExpressionError, RowTransform, expression_cache_stats
+from reclaimer import storage_reclaimer
+from aggregations import HISTOGRAM_BINNING, RunningAggregate, aggregate, pivot, to_chart_data
+from coalescing import request_coalescer
+from admission import join_admission, summary_admission, upload_admission
+from joins import HashJoin, JoinError
+from csv_parallel import shutdown_parse_pool
+from profiling import install_profiler, profile_store, render_profile_text, dump_profile
+from summaries import MAX_HISTOGRAM_BINS, compute_histogram, compute_summary, summary_columns
+from saved_charts import (
+    MAX_SAVED_CHARTS, applicable_chart_definitions, chart_definition_applies,
+    materialize_chart, materialize_saved_charts
+)
 
 # Configuration
 SECRET_KEY = "your-secret-key-change-in-production-12345678"
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
+PROFILER_ROLES = {"admin"}
+ADMIN_ROLE = "admin"
+# Privileged roles cannot be chosen at signup; only these emails get the admin role
+ADMIN_EMAILS = {email.strip().lower() for email in os.getenv("ADMIN_EMAILS", "").split(",") if email.strip()}
+MAX_PIVOT_CELLS = 250000
+DATASET_PAGE_SIZE = 100
+MAX_BULK_DELETE = 1000
+SSE_PARTIAL_INTERVAL = 0.25  # seconds between partial summary events
+MAX_DATASET_PAGE_SIZE = 1000
+CHART_AGGREGATIONS = ("count", "sum", "average", "avg", "min", "max", "histogram")
+CHART_TYPES = ("bar", "line", "pie")
+
+# Fields returned by the dataset listing; all are in the listing index, so
+# the query is answered from the index alone
+DATASET_LISTING_PROJECTION = {
+    "_id": 1, "filename": 1, "upload_date": 1,
+    "row_count": 1, "column_count": 1, "file_size": 1
+}
+
+# HTTP caching: responses are per-user, and always revalidated with the ETag
+CACHE_CONTROL = "private, no-cache"
+ETAG_SCHEMA = "1"  # Bump when a cached response format changes
 
 # Initialize FastAPI
 app = FastAPI(title="DataViz Pro API - MongoDB", version="2.0.0")
@@ -34,21 +88,17 @@ async def startup_db_client():
     """Connect to MongoDB on startup"""
     await connect_to_mongodb()
     await create_indexes()
+    await ingest_queue.start()
+    await storage_reclaimer.start()
 
 @app.on_event("shutdown")
 async def shutdown_db_client():
     """Close MongoDB connection on shutdown"""
+    await ingest_queue.stop()
+    await storage_reclaimer.stop()
+    shutdown_parse_pool()
     await close_mongodb_connection()
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["http://localhost:5173", "http://localhost:5174"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 # Security
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
 
@@ -66,6 +116,35 @@ class Token(BaseModel):
     access_token: str
     token_type: str
 
+class ExpiryRequest(BaseModel):
+    expires_at: Optional[datetime] = None
+
+class BulkDeleteRequest(BaseModel):
+    dataset_ids: List[str]
+
+class SavedChartCreate(BaseModel):
+    name: Optional[str] = None
+    column: str
+    aggregation: str = "count"
+    value_column: Optional[str] = None
+    filter: Optional[str] = None
+    bins: int = 20
+    binning: str = "width"
+    chart_type: str = "bar"
+
+class JoinRequest(BaseModel):
+    left_dataset_id: str
+    right_dataset_id: str
+    left_on: List[str]
+    right_on: List[str]
+    how: str = "inner"
+    left_columns: Optional[List[str]] = None
+    right_columns: Optional[List[str]] = None
+    materialize: bool = False
+    filename: Optional[str] = None
+    page: int = 1
+    page_size: int = 50
+
 # Helper Functions - Authentication
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
@@ -112,6 +191,73 @@ async def get_current_user(token: str = Depends(oauth2_scheme)):
     
     return {"email": user["email"], "role": user["role"]}
 
+async def get_admin_user(current_user: dict = Depends(get_current_user)):
+    """Require an authenticated admin user"""
+    if current_user["role"] != ADMIN_ROLE:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+    return current_user
+
+async def authorize_profiling(headers: dict) -> Optional[str]:
+    """Return the email of a profiler-authorized user from raw request headers"""
+    scheme, _, token = headers.get(b"authorization", b"").decode().partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except jwt.PyJWTError:
+        return None
+    
+    users = get_users_collection()
+    user = await users.find_one({"email": payload.get("sub")})
+    if not user or user.get("role") not in PROFILER_ROLES:
+        return None
+    return user["email"]
+
+# Profiling middleware (only installed when PROFILING_ENABLED=true)
+install_profiler(app, authorize_profiling)
+
+# CORS middleware (added last so it is outermost and also covers the
+# profiler's own 403/429 responses)
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=["http://localhost:5173", "http://localhost:5174"],
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor", "X-Profile-Id", "X-Histogram-Bins"],
+)
+
+# Helper Functions - HTTP Caching
+def make_etag(*parts) -> str:
+    """Build a strong ETag from the parts that identify a representation"""
+    raw = ":".join(str(part) for part in (ETAG_SCHEMA,) + parts)
+    return '"' + hashlib.sha1(raw.encode('utf-8')).hexdigest() + '"'
+
+def dataset_etag(dataset: dict, resource: str, *extra) -> str:
+    """ETag for a dataset resource; datasets only change by bumping `version`
+
+    `extra` holds anything else the response depends on.
+    """
+    return make_etag(resource, dataset["_id"], dataset.get("version", 1), *extra)
+
+def check_etag(request: Request, response: Response, etag: str) -> Optional[Response]:
+    """Set caching headers and return a 304 response if the client copy is current"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        if "*" in candidates or etag in candidates:
+            return Response(
+                status_code=status.HTTP_304_NOT_MODIFIED,
+                headers={"ETag": etag, "Cache-Control": CACHE_CONTROL}
+            )
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = CACHE_CONTROL
+    return None
+
 # Routes - Health Check
 @app.get("/")
 def root():
@@ -137,6 +283,12 @@ async def signup(user: UserCreate):
             detail="Email already registered"
         )
     
+    if user.role == ADMIN_ROLE and user.email.lower() not in ADMIN_EMAILS:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="The admin role is assigned by the operator (ADMIN_EMAILS)"
+        )
+    
     # Create new user document
     hashed_password = get_password_hash(user.password)
     user_doc = {
@@ -191,102 +343,375 @@ async def get_current_user_info(current_user: dict = Depends(get_current_user)):
         role=current_user["role"]
     )
 
+# Helper Functions - Uploads
+def validate_upload_extension(filename: str) -> str:
+    """Return the lower-cased file extension, rejecting unsupported types"""
+    file_ext = os.path.splitext(filename or "")[1].lower()
+    
+    if file_ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid file type. Only CSV and Excel files are allowed."
+        )
+    return file_ext
+
+def parse_options(sheet: Optional[str], header_row: int) -> dict:
+    """Validate Excel parsing options sent with an upload"""
+    if header_row < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="header_row must be 1 or greater"
+        )
+    return {"sheet": sheet, "header_row": header_row}
+
+@asynccontextmanager
+async def upload_form(request: Request):
+    """Receive an upload's multipart form; yields (file, extension, options)
+    
+    Upload routes read the form inside their admission slot, so an upload
+    that is rejected is refused before its body is received.
+    """
+    form = await request.form()
+    try:
+        file = form.get("file")
+        if not isinstance(file, FormFile):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="No file was uploaded"
+            )
+        try:
+            header_row = int(form.get("header_row") or 1)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="header_row must be an integer"
+            )
+        file_ext = validate_upload_extension(file.filename)
+        yield file, file_ext, parse_options(form.get("sheet") or None, header_row)
+    finally:
+        await form.close()
+
+# Helper Functions - Expressions
+def parse_row_transform(filter_expression: Optional[str], derive: List[str]) -> RowTransform:
+    """Compile the filter and derived columns of a request"""
+    try:
+        return RowTransform(filter_expression, derive)
+    except ExpressionError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
+def json_records(df: pd.DataFrame) -> List[dict]:
+    """Rows as JSON-safe dicts (NaN from derived columns becomes null)"""
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+async def filtered_page(dataset: dict, transform: RowTransform, start: int, end: int) -> Tuple[List[dict], int]:
+    """Rows [start, end) of a dataset after `transform`, and how many rows match
+
+    Reads one stored chunk at a time, so only a chunk and the page are in memory.
+    """
+    dataset = await with_inline_rows(dataset)
+    page, matched = [], 0
+    async for rows in iter_row_chunks(dataset):
+        df = await run_in_threadpool(transform.apply, pd.DataFrame(rows, columns=dataset["columns"]))
+        if matched < end and matched + len(df) > start:
+            page.extend(json_records(df.iloc[max(start - matched, 0):end - matched]))
+        matched += len(df)
+    return page, matched
+
+# Helper Functions - Request Coalescing
+def coalescing_key(resource: str, dataset: dict, user_email: str, *params) -> tuple:
+    """Identity of a read request: same owner, dataset version and parameters"""
+    return (resource, user_email, str(dataset["_id"]), dataset.get("version", 1), params)
+
+async def run_coalesced(key: tuple, response: Response, compute):
+    """Run `compute(response)` once for identical concurrent requests
+    
+    Headers the computation sets are copied onto every caller's response.
+    """
+    async def run():
+        scratch = Response()
+        del scratch.headers["content-length"]
+        result = await compute(scratch)
+        return result, dict(scratch.headers)
+    
+    result, headers = await request_coalescer.run(key, run)
+    response.headers.update(headers)
+    return result
+
+# Helper Functions - Dataset Listing
+def encode_dataset_cursor(dataset: dict) -> str:
+    """Opaque cursor pointing just past `dataset` in the newest-first listing"""
+    raw = f"{dataset['upload_date'].isoformat()}|{dataset['_id']}"
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_dataset_cursor(cursor: str) -> dict:
+    """Query filter for the datasets after a listing cursor"""
+    try:
+        upload_date, dataset_id = base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8').split("|")
+        upload_date = datetime.fromisoformat(upload_date)
+        dataset_id = ObjectId(dataset_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+    return {"$or": [
+        {"upload_date": {"$lt": upload_date}},
+        {"upload_date": upload_date, "_id": {"$lt": dataset_id}}
+    ]}
+
 # Routes - Data Management
 @app.post("/upload/")
 async def upload_file(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    current_user: dict = Depends(get_current_user)
+):
+    """Upload and parse CSV/Excel file (form fields: file, sheet and header_row, which apply to Excel)"""
+    async with upload_admission.slot(current_user["email"]), upload_form(request) as (file, file_ext, options):
+        # Spool to disk, then parse and store in batches off the event loop
+        path = await spool_upload(file, file_ext)
+        try:
+            dataset_doc = await ingest_file(path, file_ext, file.filename, current_user["email"], **options)
+        except IngestError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Error parsing file: {str(e)}"
+            )
+        finally:
+            remove_spooled(path)
+    
+    # Precompute the user's saved charts after responding, outside the upload
+    # slot, so the dashboard opens without aggregating
+    charts = await applicable_chart_definitions(dataset_doc)
+    background_tasks.add_task(materialize_saved_charts, dataset_doc, charts)
+    
+    return {
+        "message": "File uploaded successfully",
+        "dataset_id": str(dataset_doc["_id"]),
+        "filename": file.filename,
+        "rows": dataset_doc["row_count"],
+        "columns": dataset_doc["column_count"],
+        "saved_charts": len(charts)
+    }
+
+@app.post("/upload/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_upload_job(
     file: UploadFile = File(...),
+    sheet: Optional[str] = Form(None),
+    header_row: int = Form(1),
     current_user: dict = Depends(get_current_user)
 ):
-    """Upload and parse CSV/Excel file"""
-    # Validate file type
-    allowed_extensions = ['.csv', '.xlsx', '.xls']
-    file_ext = os.path.splitext(file.filename)[1].lower()
+    """Queue a CSV/Excel file for background ingestion and return a job id"""
+    file_ext = validate_upload_extension(file.filename)
+    options = parse_options(sheet, header_row)
     
-    if file_ext not in allowed_extensions:
+    path = await spool_upload(file, file_ext)
+    try:
+        job_id = await ingest_queue.submit(path, file_ext, file.filename, current_user["email"], options)
+    except IngestQueueFull:
+        remove_spooled(path)
         raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid file type. Only CSV and Excel files are allowed."
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Ingest queue is full, please retry later",
+            headers={"Retry-After": "30"}
         )
     
-    # Read file content
-    contents = await file.read()
+    return {
+        "message": "File queued for processing",
+        "job_id": job_id,
+        "filename": file.filename,
+        "status": JOB_QUEUED
+    }
+
+@app.get("/upload/jobs/{job_id}")
+async def get_upload_job(
+    job_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the progress of a background ingestion job"""
+    jobs = get_ingest_jobs_collection()
     
-    # Parse file with pandas
     try:
-        if file_ext == '.csv':
-            df = pd.read_csv(io.BytesIO(contents))
-        else:
-            df = pd.read_excel(io.BytesIO(contents))
-    except Exception as e:
+        obj_id = ObjectId(job_id)
+    except Exception:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Error parsing file: {str(e)}"
+            detail="Invalid job ID format"
         )
     
-    # Convert DataFrame to dict (convert timestamps and other non-serializable types to strings)
-    df = df.fillna('')  # Replace NaN with empty string
-    for col in df.columns:
-        if pd.api.types.is_datetime64_any_dtype(df[col]):
-            df[col] = df[col].astype(str)
+    job = await jobs.find_one({"_id": obj_id})
     
-    data_dict = df.to_dict('records')
+    if not job or job["user_email"] != current_user["email"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Job not found"
+        )
     
-    # Create dataset document for MongoDB
-    dataset_doc = {
-        "filename": file.filename,
-        "user_email": current_user["email"],
-        "upload_date": datetime.utcnow(),
-        "row_count": len(df),
-        "column_count": len(df.columns),
-        "columns": df.columns.tolist(),
-        "file_size": len(contents),
-        "data": data_dict
+    return {
+        "job_id": str(job["_id"]),
+        "filename": job["filename"],
+        "status": job["status"],
+        "rows_processed": job["rows_processed"],
+        "dataset_id": job["dataset_id"],
+        "error": job["error"],
+        "created_at": job["created_at"].isoformat(),
+        "updated_at": job["updated_at"].isoformat()
     }
-    
-    # Insert into MongoDB
+
+@app.post("/data/{dataset_id}/append")
+async def append_to_dataset(
+    dataset_id: str,
+    request: Request,
+    current_user: dict = Depends(get_current_user)
+):
+    """Append rows from a CSV/Excel file with the same columns to an existing dataset
+
+    Form fields are as for /upload/.
+    """
     datasets = get_datasets_collection()
-    result = await datasets.insert_one(dataset_doc)
+    
+    # Convert string ID to ObjectId
+    try:
+        obj_id = ObjectId(dataset_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid dataset ID format"
+        )
+    
+    dataset = await datasets.find_one({"_id": obj_id}, {"data": 0, "sketches": 0})
+    
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+    
+    if dataset["user_email"] != current_user["email"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to modify this dataset"
+        )
+    
+    async with upload_admission.slot(current_user["email"]), upload_form(request) as (file, file_ext, options):
+        path = await spool_upload(file, file_ext)
+        try:
+            result = await append_file(dataset, path, file_ext, **options)
+        except IngestError as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Error parsing file: {str(e)}"
+            )
+        except AppendConflict as e:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail=str(e)
+            )
+        finally:
+            remove_spooled(path)
     
     return {
-        "message": "File uploaded successfully",
-        "dataset_id": str(result.inserted_id),
-        "filename": file.filename,
-        "rows": len(df),
-        "columns": len(df.columns)
+        "message": "Rows appended successfully",
+        "dataset_id": dataset_id,
+        "rows_added": result["rows_added"],
+        "total_rows": result["total_rows"],
+        "version": result["version"]
     }
 
 @app.get("/data/datasets")
-async def get_datasets(current_user: dict = Depends(get_current_user)):
-    """Get all datasets for current user"""
+async def get_datasets(
+    request: Request,
+    response: Response,
+    limit: int = Query(DATASET_PAGE_SIZE, ge=1, le=MAX_DATASET_PAGE_SIZE),
+    cursor: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get datasets for current user, newest first
+
+    Returns at most `limit` datasets; when there are more, the X-Next-Cursor
+    header holds the cursor for the next page.
+    """
     datasets = get_datasets_collection()
+    query = {"user_email": current_user["email"]}
+    if cursor:
+        query.update(decode_dataset_cursor(cursor))
+    
+    # Walks the listing index; one extra row tells us whether a next page exists
+    docs = await datasets.find(query, DATASET_LISTING_PROJECTION).sort(
+        [("upload_date", -1), ("_id", -1)]
+    ).limit(limit + 1).to_list(limit + 1)
+    
+    next_cursor = None
+    if len(docs) > limit:
+        docs = docs[:limit]
+        next_cursor = encode_dataset_cursor(docs[-1])
     
-    # Find all datasets for current user
-    cursor = datasets.find(
-        {"user_email": current_user["email"]},
-        {"data": 0}  # Exclude the data field for performance
-    ).sort("upload_date", -1)  # Sort by newest first
+    # Built from the page itself (appends change row_count and file_size), so
+    # revalidating costs the same covered index scan and nothing more
+    etag = make_etag(
+        "datasets", current_user["email"], limit, cursor, next_cursor,
+        *((doc["_id"], doc["row_count"], doc["file_size"]) for doc in docs)
+    )
+    not_modified = check_etag(request, response, etag)
+    if not_modified:
+        return not_modified
+    
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
     
-    user_datasets = []
-    async for dataset in cursor:
-        user_datasets.append({
+    return [
+        {
             "id": str(dataset["_id"]),
             "filename": dataset["filename"],
             "upload_date": dataset["upload_date"].isoformat(),
             "row_count": dataset["row_count"],
             "column_count": dataset["column_count"],
             "file_size": dataset["file_size"]
-        })
+        }
+        for dataset in docs
+    ]
+
+@app.get("/data/datasets/totals")
+async def get_dataset_totals(current_user: dict = Depends(get_current_user)):
+    """Get the number of datasets, rows and bytes stored by the current user"""
+    datasets = get_datasets_collection()
+    
+    totals = await datasets.aggregate([
+        {"$match": {"user_email": current_user["email"]}},
+        {"$group": {
+            "_id": None,
+            "count": {"$sum": 1},
+            "rows": {"$sum": "$row_count"},
+            "bytes": {"$sum": "$file_size"}
+        }}
+    ]).to_list(1)
+    totals = totals[0] if totals else {}
     
-    return user_datasets
+    return {
+        "dataset_count": totals.get("count", 0),
+        "total_rows": totals.get("rows", 0),
+        "total_bytes": totals.get("bytes", 0)
+    }
 
 @app.get("/data/{dataset_id}")
 async def get_dataset_data(
     dataset_id: str,
-    page: int = 1,
-    page_size: int = 50,
+    request: Request,
+    response: Response,
+    page: int = Query(1, ge=1),
+    page_size: int = Query(50, ge=1),
+    filter_expression: Optional[str] = Query(None, alias="filter"),
+    derive: List[str] = Query([]),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get paginated dataset data"""
+    """Get paginated dataset data
+
+    `filter` keeps only matching rows and each `derive` (name=expression)
+    adds a computed column, e.g. filter=amount > 100&derive=total=price * qty.
+    """
     datasets = get_datasets_collection()
     
     # Convert string ID to ObjectId
@@ -298,8 +723,8 @@ async def get_dataset_data(
             detail="Invalid dataset ID format"
         )
     
-    # Find dataset
-    dataset = await datasets.find_one({"_id": obj_id})
+    # Find dataset (row data is only loaded once we know it is needed)
+    dataset = await datasets.find_one({"_id": obj_id}, {"data": 0, "sketches": 0})
     
     if not dataset:
         raise HTTPException(
@@ -314,22 +739,52 @@ async def get_dataset_data(
             detail="Not authorized to access this dataset"
         )
     
+    transform = parse_row_transform(filter_expression, derive)
+    
+    not_modified = check_etag(request, response, dataset_etag(dataset, "data"))
+    if not_modified:
+        return not_modified
+    
     # Paginate data
     start_idx = (page - 1) * page_size
     end_idx = start_idx + page_size
-    paginated_data = dataset["data"][start_idx:end_idx]
+    
+    async def load_page(scratch: Response):
+        if transform:
+            async with summary_admission.slot(current_user["email"]):
+                try:
+                    cached = hot_frames.get(dataset)
+                    if cached is not None:
+                        # Already in memory here: cut the page after one vectorized pass
+                        df = await run_in_threadpool(transform.apply, cached)
+                        return json_records(df.iloc[start_idx:end_idx]), len(df)
+                    return await filtered_page(dataset, transform, start_idx, end_idx)
+                except ExpressionError as e:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=str(e)
+                    )
+        
+        full = await with_inline_rows(dataset)
+        return await fetch_rows(full, start_idx, end_idx), full["row_count"]
+    
+    # Identical concurrent page requests (e.g. many tabs) share one fetch
+    key = coalescing_key("data", dataset, current_user["email"], page, page_size, filter_expression, tuple(derive))
+    paginated_data, total_rows = await run_coalesced(key, response, load_page)
     
     return {
         "data": paginated_data,
-        "total_rows": dataset["row_count"],
+        "total_rows": total_rows,
         "page": page,
         "page_size": page_size,
-        "total_pages": (dataset["row_count"] + page_size - 1) // page_size
+        "total_pages": (total_rows + page_size - 1) // page_size
     }
 
 @app.get("/data/{dataset_id}/metadata")
 async def get_dataset_metadata(
     dataset_id: str,
+    request: Request,
+    response: Response,
     current_user: dict = Depends(get_current_user)
 ):
     """Get dataset metadata without data"""
@@ -345,7 +800,7 @@ async def get_dataset_metadata(
         )
     
     # Find dataset (exclude data field)
-    dataset = await datasets.find_one({"_id": obj_id}, {"data": 0})
+    dataset = await datasets.find_one({"_id": obj_id}, {"data": 0, "sketches": 0})
     
     if not dataset:
         raise HTTPException(
@@ -359,6 +814,13 @@ async def get_dataset_metadata(
             detail="Not authorized to access this dataset"
         )
     
+    # Expiry changes without a version bump, so it is part of the ETag
+    expires_at = dataset.get("expires_at")
+    etag = dataset_etag(dataset, "metadata", expires_at)
+    not_modified = check_etag(request, response, etag)
+    if not_modified:
+        return not_modified
+    
     return {
         "id": str(dataset["_id"]),
         "filename": dataset["filename"],
@@ -366,18 +828,35 @@ async def get_dataset_metadata(
         "row_count": dataset["row_count"],
         "column_count": dataset["column_count"],
         "columns": dataset["columns"],
-        "file_size": dataset["file_size"]
+        "file_size": dataset["file_size"],
+        "expires_at": expires_at.isoformat() if expires_at else None
     }
 
 @app.get("/data/{dataset_id}/summary")
 async def get_dataset_summary(
     dataset_id: str,
     column: str,
+    request: Request,
+    response: Response,
     aggregation: str = "count",
     value_column: Optional[str] = None,
+    approximate: bool = False,
+    bins: int = 20,
+    binning: str = "width",
+    filter_expression: Optional[str] = Query(None, alias="filter"),
+    derive: List[str] = Query([]),
     current_user: dict = Depends(get_current_user)
 ):
-    """Get aggregated data for charts"""
+    """Get aggregated data for charts
+
+    With approximate=true the answer comes from the dataset's row sample:
+    counts and sums are scaled up and every item carries an `error` (95%
+    confidence half-width). `filter` and `derive` work as on the data
+    endpoint; `column` and `value_column` may name derived columns.
+    
+    aggregation=histogram bins the numeric values of `column` (binning=width,
+    quantile or fd) and returns exact counts with each bin's start and end.
+    """
     datasets = get_datasets_collection()
     
     # Convert string ID to ObjectId
@@ -389,8 +868,8 @@ async def get_dataset_summary(
             detail="Invalid dataset ID format"
         )
     
-    # Find dataset
-    dataset = await datasets.find_one({"_id": obj_id})
+    # Find dataset (row data is only loaded once we know it is needed)
+    dataset = await datasets.find_one({"_id": obj_id}, {"data": 0, "sketches": 0})
     
     if not dataset:
         raise HTTPException(
@@ -404,65 +883,340 @@ async def get_dataset_summary(
             detail="Not authorized to access this dataset"
         )
     
-    # Convert to DataFrame for aggregation
-    df = pd.DataFrame(dataset["data"])
+    transform = parse_row_transform(filter_expression, derive)
+    
+    if aggregation == "histogram":
+        if not 1 <= bins <= MAX_HISTOGRAM_BINS:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Bins must be within [1, {MAX_HISTOGRAM_BINS}]"
+            )
+        if binning not in HISTOGRAM_BINNING:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Binning must be one of {', '.join(HISTOGRAM_BINNING)}"
+            )
+        if column not in dataset["columns"] and column not in transform.derived_names:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Column '{column}' not found in dataset"
+            )
     
-    if column not in df.columns:
+    not_modified = check_etag(request, response, dataset_etag(dataset, "summary"))
+    if not_modified:
+        return not_modified
+    
+    async def summarize(scratch: Response):
+        async with summary_admission.slot(current_user["email"]):
+            if aggregation == "histogram":
+                return await compute_histogram(dataset, column, binning, bins, scratch, transform)
+            return await compute_summary(
+                dataset, column, aggregation, value_column, approximate, scratch, transform
+            )
+    
+    # Concurrent duplicates wait for one computation (and take one admission slot)
+    key = coalescing_key(
+        "summary", dataset, current_user["email"], column, aggregation, value_column,
+        approximate, bins, binning, filter_expression, tuple(derive)
+    )
+    return await run_coalesced(key, response, summarize)
+
+@app.get("/data/{dataset_id}/summary/stream")
+async def stream_dataset_summary(
+    dataset_id: str,
+    column: str,
+    aggregation: str = "count",
+    value_column: Optional[str] = None,
+    filter_expression: Optional[str] = Query(None, alias="filter"),
+    derive: List[str] = Query([]),
+    current_user: dict = Depends(get_current_user)
+):
+    """Stream a chart aggregation as Server-Sent Events
+
+    `partial` events carry the result over the rows read so far (counts and
+    sums extrapolated to the whole dataset); the final `result` event is exact.
+    """
+    datasets = get_datasets_collection()
+    
+    # Convert string ID to ObjectId
+    try:
+        obj_id = ObjectId(dataset_id)
+    except Exception:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Column '{column}' not found in dataset"
+            detail="Invalid dataset ID format"
         )
     
-    # Perform aggregation
+    dataset = await datasets.find_one({"_id": obj_id}, {"data": 0, "sketches": 0})
+    
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+    
+    if dataset["user_email"] != current_user["email"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this dataset"
+        )
+    
+    transform = parse_row_transform(filter_expression, derive)
+    for name in (column, value_column):
+        if name is not None and name not in dataset["columns"] and name not in transform.derived_names:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Column '{name}' not found in dataset"
+            )
+    
+    running = RunningAggregate(column, aggregation, value_column)
+    
+    return StreamingResponse(
+        stream_summary_events(dataset, running, current_user["email"], transform),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def stream_summary_events(dataset: dict, running: RunningAggregate, user_email: str,
+                                transform: RowTransform):
+    """Fold a dataset's chunks into `running`, emitting partial results as SSE"""
+    total_rows = dataset["row_count"]
+    columns = summary_columns(running.column, running.aggregation, running.value_column)
+    if columns is not None:
+        columns = transform.source_columns(columns)
+    
     try:
-        if aggregation == "count":
-            # Count occurrences of each unique value
-            result = df[column].value_counts().to_dict()
-        else:
-            # For sum, avg, min, max - need a value column
-            if not value_column:
-                # If no value column specified, try to find a numeric column
-                numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-                if not numeric_cols:
-                    raise HTTPException(
-                        status_code=status.HTTP_400_BAD_REQUEST,
-                        detail="No numeric columns found for aggregation"
-                    )
-                value_column = numeric_cols[0]
-            
-            if value_column not in df.columns:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Value column '{value_column}' not found in dataset"
+        async with summary_admission.slot(user_email):
+            cached = hot_frames.get(dataset)
+            if cached is not None:
+                # Already in memory here: the exact answer is immediate
+                df = cached
+                if transform:
+                    df = await run_in_threadpool(transform.apply, df, columns)
+                result = await run_in_threadpool(
+                    aggregate, df, running.column, running.aggregation, running.value_column
                 )
+                yield sse_event("result", {
+                    "rows_processed": total_rows,
+                    "total_rows": total_rows,
+                    "data": to_chart_data(result)
+                })
+                return
             
-            # Group by column and aggregate value_column
-            if aggregation == "sum":
-                result = df.groupby(column)[value_column].sum().to_dict()
-            elif aggregation == "average" or aggregation == "avg":
-                result = df.groupby(column)[value_column].mean().to_dict()
-            elif aggregation == "min":
-                result = df.groupby(column)[value_column].min().to_dict()
-            elif aggregation == "max":
-                result = df.groupby(column)[value_column].max().to_dict()
-            else:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail="Invalid aggregation type"
-                )
-        
-        # Convert to chart-friendly format
-        chart_data = [
-            {"name": str(k), "value": float(v) if isinstance(v, (int, float)) else v} 
-            for k, v in result.items()
-        ]
-        
-        return chart_data
+            dataset = await with_inline_rows(dataset)
+            last_sent = 0.0
+            async for rows in iter_row_chunks(dataset, columns):
+                df = pd.DataFrame(rows, columns=columns or dataset["columns"])
+                if transform:
+                    df = await run_in_threadpool(transform.apply, df)
+                await run_in_threadpool(running.update, df, len(rows))
+                
+                # First chunk right away, then at most every SSE_PARTIAL_INTERVAL
+                now = time.monotonic()
+                if running.rows < total_rows and now - last_sent >= SSE_PARTIAL_INTERVAL:
+                    last_sent = now
+                    yield sse_event("partial", {
+                        "rows_processed": running.rows,
+                        "total_rows": total_rows,
+                        "data": await run_in_threadpool(running.result, total_rows)
+                    })
+            
+            yield sse_event("result", {
+                "rows_processed": running.rows,
+                "total_rows": total_rows,
+                "data": await run_in_threadpool(running.result)
+            })
+    except HTTPException as e:
+        yield sse_event("error", {"status": e.status_code, "detail": e.detail})
     except Exception as e:
+        yield sse_event("error", {
+            "status": status.HTTP_400_BAD_REQUEST,
+            "detail": f"Error performing aggregation: {str(e)}"
+        })
+
+@app.get("/data/{dataset_id}/pivot")
+async def get_dataset_pivot(
+    dataset_id: str,
+    row_column: str,
+    column_column: str,
+    request: Request,
+    response: Response,
+    aggregation: str = "count",
+    value_column: Optional[str] = None,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get a two-column cross-tab (heatmap) as a matrix with row and column labels"""
+    datasets = get_datasets_collection()
+    
+    # Convert string ID to ObjectId
+    try:
+        obj_id = ObjectId(dataset_id)
+    except Exception:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Error performing aggregation: {str(e)}"
+            detail="Invalid dataset ID format"
+        )
+    
+    dataset = await datasets.find_one({"_id": obj_id}, {"data": 0, "sketches": 0})
+    
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
         )
+    
+    if dataset["user_email"] != current_user["email"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this dataset"
+        )
+    
+    for name in (row_column, column_column, value_column):
+        if name is not None and name not in dataset["columns"]:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Column '{name}' not found in dataset"
+            )
+    
+    not_modified = check_etag(request, response, dataset_etag(dataset, "pivot"))
+    if not_modified:
+        return not_modified
+    
+    async with summary_admission.slot(current_user["email"]):
+        async with hot_frames.frame(dataset) as df:
+            return await run_in_threadpool(
+                pivot, df, row_column, column_column, aggregation, value_column, MAX_PIVOT_CELLS
+            )
+
+@app.get("/data/{dataset_id}/quantiles")
+async def get_dataset_quantiles(
+    dataset_id: str,
+    column: str,
+    request: Request,
+    response: Response,
+    q: List[float] = Query([0.5, 0.9, 0.99]),
+    bins: int = 0,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get distinct count, quantiles and an optional histogram from column sketches
+
+    Answers come from the sketches stored with the dataset, so the cost does
+    not depend on the number of rows.
+    """
+    datasets = get_datasets_collection()
+    
+    # Convert string ID to ObjectId
+    try:
+        obj_id = ObjectId(dataset_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid dataset ID format"
+        )
+    
+    dataset = await datasets.find_one({"_id": obj_id}, {"data": 0})
+    
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+    
+    if dataset["user_email"] != current_user["email"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this dataset"
+        )
+    
+    if column not in dataset["columns"]:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Column '{column}' not found in dataset"
+        )
+    
+    if any(not 0 <= value <= 1 for value in q) or not 0 <= bins <= MAX_HISTOGRAM_BINS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Quantiles must be within [0, 1] and bins within [0, {MAX_HISTOGRAM_BINS}]"
+        )
+    
+    not_modified = check_etag(request, response, dataset_etag(dataset, "quantiles"))
+    if not_modified:
+        return not_modified
+    
+    if "sketches" not in dataset:
+        # Datasets stored before sketching get theirs built once, on demand
+        legacy = await datasets.find_one({"_id": obj_id})
+        df = await load_dataframe(legacy)
+        sketch_set = SketchSet()
+        # Cleaning and sketching a whole dataset is CPU work; keep it off the event loop
+        await run_in_threadpool(sketch_set.update, await run_in_threadpool(clean_frame, df))
+        dataset["sketches"] = await run_in_threadpool(sketch_set.to_docs)
+        await datasets.update_one({"_id": obj_id}, {"$set": {"sketches": dataset["sketches"]}})
+    
+    sketch_doc = next((doc for doc in dataset["sketches"] if doc["column"] == column), None)
+    sketch = ColumnSketch.from_doc(sketch_doc) if sketch_doc else ColumnSketch(column)
+    digest = sketch.digest
+    
+    return {
+        "column": column,
+        "count": sketch.count,
+        "distinct_count": sketch.hll.estimate(),
+        "numeric_count": int(digest.count),
+        "min": digest.min,
+        "max": digest.max,
+        "quantiles": [{"q": value, "value": digest.quantile(value)} for value in q],
+        "histogram": digest.histogram(bins) if bins else []
+    }
+
+@app.put("/data/{dataset_id}/expiry")
+async def set_dataset_expiry(
+    dataset_id: str,
+    expiry: ExpiryRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Set (or clear, with expires_at null) when a dataset is deleted automatically"""
+    datasets = get_datasets_collection()
+    
+    # Convert string ID to ObjectId
+    try:
+        obj_id = ObjectId(dataset_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid dataset ID format"
+        )
+    
+    expires_at = expiry.expires_at
+    if expires_at is not None:
+        # Stored as naive UTC like every other timestamp
+        if expires_at.tzinfo is not None:
+            expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+        if expires_at <= datetime.utcnow():
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="expires_at must be in the future"
+            )
+    
+    update = {"$set": {"expires_at": expires_at}} if expires_at else {"$unset": {"expires_at": ""}}
+    result = await datasets.update_one(
+        {"_id": obj_id, "user_email": current_user["email"]}, update
+    )
+    
+    if not result.matched_count:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+    
+    return {
+        "dataset_id": dataset_id,
+        "expires_at": expires_at.isoformat() if expires_at else None
+    }
 
 @app.delete("/data/{dataset_id}")
 async def delete_dataset(
@@ -481,8 +1235,8 @@ async def delete_dataset(
             detail="Invalid dataset ID format"
         )
     
-    # Find dataset first to verify ownership
-    dataset = await datasets.find_one({"_id": obj_id})
+    # Find dataset first to verify ownership (only the owner is needed)
+    dataset = await datasets.find_one({"_id": obj_id}, {"user_email": 1})
     
     if not dataset:
         raise HTTPException(
@@ -496,11 +1250,373 @@ async def delete_dataset(
             detail="Not authorized to delete this dataset"
         )
     
-    # Delete from MongoDB
+    # Delete from MongoDB; row storage is reclaimed in the background
     await datasets.delete_one({"_id": obj_id})
+    await forget_datasets([obj_id])
     
     return {"message": "Dataset deleted successfully"}
 
+@app.post("/data/datasets/delete")
+async def delete_datasets(
+    delete_request: BulkDeleteRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Delete many of the current user's datasets at once"""
+    datasets = get_datasets_collection()
+    
+    if len(delete_request.dataset_ids) > MAX_BULK_DELETE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_BULK_DELETE} datasets can be deleted per request"
+        )
+    
+    try:
+        obj_ids = list({ObjectId(dataset_id) for dataset_id in delete_request.dataset_ids})
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid dataset ID format"
+        )
+    
+    # Only ids are read; other users' datasets are reported as not found
+    owned = await datasets.find(
+        {"_id": {"$in": obj_ids}, "user_email": current_user["email"]}, {"_id": 1}
+    ).to_list(len(obj_ids))
+    owned_ids = [doc["_id"] for doc in owned]
+    
+    if owned_ids:
+        await datasets.delete_many({"_id": {"$in": owned_ids}, "user_email": current_user["email"]})
+        await forget_datasets(owned_ids)
+    
+    deleted = {str(obj_id) for obj_id in owned_ids}
+    return {
+        "message": f"{len(deleted)} dataset(s) deleted successfully",
+        "deleted": sorted(deleted),
+        "not_found": sorted({str(obj_id) for obj_id in obj_ids} - deleted)
+    }
+
+async def forget_datasets(dataset_ids: List[ObjectId]):
+    """Drop cached copies of deleted datasets and queue their storage for reclamation"""
+    for obj_id in dataset_ids:
+        hot_frames.invalidate(obj_id)
+        await run_in_threadpool(dataset_cache.drop, obj_id)
+    storage_reclaimer.schedule(dataset_ids)
+
+# Helper Functions - Joins
+async def get_join_input(dataset_id: str, user_email: str) -> dict:
+    """Fetch a dataset to join (without row data), checking ownership"""
+    datasets = get_datasets_collection()
+    
+    try:
+        obj_id = ObjectId(dataset_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid dataset ID format"
+        )
+    
+    dataset = await datasets.find_one({"_id": obj_id}, {"data": 0, "sketches": 0})
+    
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+    
+    if dataset["user_email"] != user_email:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this dataset"
+        )
+    return dataset
+
+# Helper Functions - Saved Charts
+def serialize_chart_definition(definition: dict) -> dict:
+    return {
+        "id": str(definition["_id"]),
+        "name": definition["name"],
+        "column": definition["column"],
+        "aggregation": definition["aggregation"],
+        "value_column": definition.get("value_column"),
+        "filter": definition.get("filter"),
+        "bins": definition.get("bins", 20),
+        "binning": definition.get("binning", "width"),
+        "chart_type": definition.get("chart_type", "bar"),
+        "created_at": definition["created_at"].isoformat()
+    }
+
+# Routes - Saved Charts
+@app.get("/charts")
+async def get_saved_charts(current_user: dict = Depends(get_current_user)):
+    """List the current user's saved chart definitions"""
+    chart_definitions = get_chart_definitions_collection()
+    definitions = await chart_definitions.find(
+        {"user_email": current_user["email"]}
+    ).sort("created_at", 1).to_list(MAX_SAVED_CHARTS)
+    
+    return {"charts": [serialize_chart_definition(definition) for definition in definitions]}
+
+@app.post("/charts", status_code=status.HTTP_201_CREATED)
+async def create_saved_chart(
+    chart: SavedChartCreate,
+    current_user: dict = Depends(get_current_user)
+):
+    """Save a chart definition; it is materialized for every matching upload"""
+    chart_definitions = get_chart_definitions_collection()
+    
+    if chart.aggregation not in CHART_AGGREGATIONS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid aggregation type"
+        )
+    
+    if chart.chart_type not in CHART_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Chart type must be one of {', '.join(CHART_TYPES)}"
+        )
+    
+    if not 1 <= chart.bins <= MAX_HISTOGRAM_BINS or chart.binning not in HISTOGRAM_BINNING:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Bins must be within [1, {MAX_HISTOGRAM_BINS}] and binning one of {', '.join(HISTOGRAM_BINNING)}"
+        )
+    
+    # Rejects filters that do not parse before they are stored
+    parse_row_transform(chart.filter, [])
+    
+    if await chart_definitions.count_documents({"user_email": current_user["email"]}) >= MAX_SAVED_CHARTS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {MAX_SAVED_CHARTS} charts can be saved"
+        )
+    
+    if chart.aggregation == "histogram":
+        default_name = f"histogram of {chart.column}"
+    elif chart.value_column:
+        default_name = f"{chart.aggregation} of {chart.value_column} by {chart.column}"
+    else:
+        default_name = f"{chart.aggregation} by {chart.column}"
+    
+    definition = {
+        "user_email": current_user["email"],
+        "name": chart.name or default_name,
+        "column": chart.column,
+        "aggregation": chart.aggregation,
+        "value_column": chart.value_column,
+        "filter": chart.filter or None,
+        "bins": chart.bins,
+        "binning": chart.binning,
+        "chart_type": chart.chart_type,
+        "created_at": datetime.utcnow()
+    }
+    result = await chart_definitions.insert_one(definition)
+    definition["_id"] = result.inserted_id
+    
+    return serialize_chart_definition(definition)
+
+@app.delete("/charts/{chart_id}")
+async def delete_saved_chart(
+    chart_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Delete a saved chart definition and its stored results"""
+    chart_definitions = get_chart_definitions_collection()
+    
+    try:
+        obj_id = ObjectId(chart_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid chart ID format"
+        )
+    
+    result = await chart_definitions.delete_one({"_id": obj_id, "user_email": current_user["email"]})
+    
+    if not result.deleted_count:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Saved chart not found"
+        )
+    
+    await get_chart_results_collection().delete_many({"definition_id": obj_id})
+    
+    return {"message": "Saved chart deleted successfully"}
+
+@app.get("/data/{dataset_id}/charts")
+async def get_dataset_charts(
+    dataset_id: str,
+    current_user: dict = Depends(get_current_user)
+):
+    """Get the stored results of the user's saved charts for a dataset
+
+    Results are computed when a dataset is stored. Charts saved later, or
+    results from an older version of the dataset, are computed (and stored)
+    on first request.
+    """
+    datasets = get_datasets_collection()
+    chart_definitions = get_chart_definitions_collection()
+    chart_results = get_chart_results_collection()
+    
+    # Convert string ID to ObjectId
+    try:
+        obj_id = ObjectId(dataset_id)
+    except Exception:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid dataset ID format"
+        )
+    
+    dataset = await datasets.find_one({"_id": obj_id}, {"data": 0, "sketches": 0})
+    
+    if not dataset:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Dataset not found"
+        )
+    
+    if dataset["user_email"] != current_user["email"]:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Not authorized to access this dataset"
+        )
+    
+    definitions = await chart_definitions.find(
+        {"user_email": current_user["email"]}
+    ).sort("created_at", 1).to_list(MAX_SAVED_CHARTS)
+    stored = {
+        result["definition_id"]: result
+        async for result in chart_results.find({"dataset_id": obj_id})
+    }
+    
+    charts = []
+    for definition in definitions:
+        if not chart_definition_applies(definition, dataset["columns"]):
+            continue
+        result = stored.get(definition["_id"])
+        if result is None or result["version"] != dataset.get("version", 1):
+            async with summary_admission.slot(current_user["email"]):
+                result = await materialize_chart(dataset, definition)
+        charts.append({
+            **serialize_chart_definition(definition),
+            "data": result["data"],
+            "error": result["error"],
+            "computed_at": result["computed_at"].isoformat()
+        })
+    
+    return {"dataset_id": dataset_id, "charts": charts}
+
+# Routes - Joins
+@app.post("/data/join")
+async def join_datasets(
+    join_request: JoinRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """Join two datasets on key columns; return a page of rows or store the result as a new dataset"""
+    if join_request.page < 1 or join_request.page_size < 1:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="page and page_size must be 1 or greater"
+        )
+    
+    left = await get_join_input(join_request.left_dataset_id, current_user["email"])
+    right = await get_join_input(join_request.right_dataset_id, current_user["email"])
+    
+    try:
+        join = HashJoin(
+            left, right,
+            join_request.left_on, join_request.right_on,
+            how=join_request.how,
+            left_columns=join_request.left_columns,
+            right_columns=join_request.right_columns
+        )
+    except JoinError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+    
+    async with join_admission.slot(current_user["email"]):
+        if not join_request.materialize:
+            start_idx = (join_request.page - 1) * join_request.page_size
+            result = await join.page(start_idx, join_request.page_size)
+            return {
+                **result,
+                "columns": join.columns,
+                "page": join_request.page,
+                "page_size": join_request.page_size
+            }
+        
+        filename = join_request.filename or f"{left['filename']} + {right['filename']}"
+        dataset_doc = await store_dataset(
+            join.materialized_batches(),
+            filename,
+            current_user["email"],
+            0,
+            extra_fields={"source": {
+                "type": "join",
+                "left_dataset_id": str(left["_id"]),
+                "right_dataset_id": str(right["_id"]),
+                "left_on": join_request.left_on,
+                "right_on": join_request.right_on,
+                "how": join_request.how
+            }}
+        )
+    
+    return {
+        "message": "Join stored as a new dataset",
+        "dataset_id": str(dataset_doc["_id"]),
+        "filename": filename,
+        "rows": dataset_doc["row_count"],
+        "columns": dataset_doc["column_count"]
+    }
+
+# Routes - Diagnostics
+@app.get("/debug/profiles/{profile_id}")
+async def download_profile(
+    profile_id: str,
+    output_format: str = Query("text", alias="format"),
+    current_user: dict = Depends(get_current_user)
+):
+    """Download a stored request profile as text or as a binary pstats dump"""
+    entry = profile_store.get(profile_id)
+    
+    if not entry or entry["owner"] != current_user["email"]:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Profile not found"
+        )
+    
+    if output_format == "pstats":
+        return Response(
+            content=dump_profile(entry["stats"]),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{profile_id}.prof"'}
+        )
+    
+    header = (
+        f"# {entry['path']} took {entry['duration_ms']} ms\n"
+        "# Event-loop-wide window: includes other requests' coroutines, excludes threadpool work\n\n"
+    )
+    return PlainTextResponse(header + render_profile_text(entry["stats"]))
+
+@app.get("/metrics")
+async def get_metrics(admin_user: dict = Depends(get_admin_user)):
+    """Expose admission control and cache state for monitoring"""
+    return {
+        "admission": {
+            "upload": upload_admission.stats(),
+            "summary": summary_admission.stats(),
+            "join": join_admission.stats()
+        },
+        "ingest_queue_depth": ingest_queue.depth,
+        "frame_cache": hot_frames.stats(),
+        "dataset_cache": dataset_cache.stats(),
+        "reclaimer": storage_reclaimer.stats(),
+        "expression_cache": expression_cache_stats(),
+        "coalescing": request_coalescer.stats()
+    }
+
 # Run with: uvicorn main_mongodb:app --reload --port 8001
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,177 @@
+"""
+Opt-in per-request profiling
+Authorized users can send an `X-Profile: 1` header to run a single request
+under cProfile. The profile is kept in memory and downloaded separately.
+
+cProfile only sees the thread it is enabled on, and a request awaits on the
+shared event loop. A profile is therefore an event-loop-wide window: it
+contains every coroutine that ran on the loop while the request was in
+flight (not only this request's), and none of the work the request handed
+to the threadpool (parsing, pandas aggregations). Profile on a quiet worker
+and read threadpool time from the request's wall-clock duration.
+
+The middleware is only installed when PROFILING_ENABLED=true, so requests
+pay nothing when profiling is switched off.
+"""
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import time
+import uuid
+from collections import OrderedDict
+from typing import Awaitable, Callable, Optional
+
+# Configuration
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"
+PROFILE_HEADER = b"x-profile"
+PROFILE_ID_HEADER = b"x-profile-id"
+PROFILE_MIN_INTERVAL_SECONDS = float(os.getenv("PROFILE_MIN_INTERVAL_SECONDS", "30"))
+PROFILE_MAX_STORED = int(os.getenv("PROFILE_MAX_STORED", "50"))
+PROFILE_TTL_SECONDS = int(os.getenv("PROFILE_TTL_SECONDS", "3600"))
+
+
+class ProfileStore:
+    """Bounded in-memory store of finished profiles"""
+
+    def __init__(self, max_items: int = PROFILE_MAX_STORED, ttl: int = PROFILE_TTL_SECONDS):
+        self.max_items = max_items
+        self.ttl = ttl
+        self._items = OrderedDict()
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for key in [k for k, v in self._items.items() if v["created"] < cutoff]:
+            del self._items[key]
+
+    def put(self, profile_id: str, owner: str, path: str, duration: float, stats: pstats.Stats):
+        self._expire()
+        self._items[profile_id] = {
+            "owner": owner,
+            "path": path,
+            "created": time.time(),
+            "duration_ms": round(duration * 1000, 3),
+            "stats": stats,
+        }
+        while len(self._items) > self.max_items:
+            self._items.popitem(last=False)
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        self._expire()
+        return self._items.get(profile_id)
+
+
+class ProfileRateLimiter:
+    """One profile in flight per process and one per user per interval"""
+
+    def __init__(self, min_interval: float = PROFILE_MIN_INTERVAL_SECONDS):
+        self.min_interval = min_interval
+        self.in_flight = False
+        self._last_started = {}
+
+    def acquire(self, user: str) -> Optional[float]:
+        """Reserve the profiler; returns seconds to wait if unavailable"""
+        now = time.monotonic()
+        # Users outside their interval need no entry
+        for key in [k for k, t in self._last_started.items() if now - t >= self.min_interval]:
+            del self._last_started[key]
+        last = self._last_started.get(user)
+        if last is not None and now - last < self.min_interval:
+            return self.min_interval - (now - last)
+        if self.in_flight:
+            # cProfile cannot nest, and concurrent profiles would overlap anyway
+            return 1.0
+        self.in_flight = True
+        self._last_started[user] = now
+        return None
+
+    def release(self):
+        self.in_flight = False
+
+
+profile_store = ProfileStore()
+rate_limiter = ProfileRateLimiter()
+
+
+def render_profile_text(stats: pstats.Stats, limit: int = 60) -> str:
+    """Render profile stats sorted by cumulative time"""
+    stream = io.StringIO()
+    stats.stream = stream
+    stats.sort_stats("cumulative").print_stats(limit)
+    return stream.getvalue()
+
+
+def dump_profile(stats: pstats.Stats) -> bytes:
+    """Serialize stats in the format read by pstats.Stats(path) and snakeviz"""
+    return marshal.dumps(stats.stats)
+
+
+class ProfilingMiddleware:
+    """ASGI middleware that profiles requests carrying the X-Profile header"""
+
+    def __init__(self, app, authorize: Callable[[dict], Awaitable[Optional[str]]]):
+        self.app = app
+        self.authorize = authorize
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        if headers.get(PROFILE_HEADER, b"").lower() not in (b"1", b"true"):
+            return await self.app(scope, receive, send)
+
+        user = await self.authorize(headers)
+        if user is None:
+            return await self._reject(send, 403, "Not authorized to profile requests")
+
+        retry_after = rate_limiter.acquire(user)
+        if retry_after is not None:
+            return await self._reject(
+                send, 429, "Profiling rate limit exceeded",
+                [(b"retry-after", str(int(retry_after) + 1).encode())],
+            )
+
+        profile_id = uuid.uuid4().hex
+
+        async def send_with_id(message):
+            if message["type"] == "http.response.start":
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER, profile_id.encode())
+                ]
+            await send(message)
+
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, send_with_id)
+            finally:
+                profiler.disable()
+            profile_store.put(
+                profile_id, user, scope.get("path", ""),
+                time.perf_counter() - start, pstats.Stats(profiler),
+            )
+        finally:
+            rate_limiter.release()
+
+    async def _reject(self, send, status_code: int, detail: str, extra_headers=None):
+        body = ('{"detail": "%s"}' % detail).encode()
+        await send({
+            "type": "http.response.start",
+            "status": status_code,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode()),
+            ] + (extra_headers or []),
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+def install_profiler(app, authorize: Callable[[dict], Awaitable[Optional[str]]]):
+    """Add the profiling middleware when profiling is enabled"""
+    if PROFILING_ENABLED:
+        app.add_middleware(ProfilingMiddleware, authorize=authorize)
+        print("🔬 Per-request profiling enabled")
@@ -0,0 +1,174 @@
+"""
+Background reclamation of orphaned row storage
+Deleting a dataset (one at a time, in bulk, or by its expires_at TTL) only
+removes the dataset document. A background task per process then finds row
+chunks and samples whose dataset no longer exists and deletes them, along
+with the dataset's saved chart results, in small batches with pauses in
+between, so cleanup never competes with foreground requests for MongoDB.
+
+Datasets deleted through the API are reclaimed on the next pass by the
+process that deleted them. Other unreferenced storage (TTL expiry, crashes)
+is found by scanning every dataset id in the chunks and samples collections,
+which only the process holding the reclaimer lease does, so the scan runs
+once per interval across all workers rather than once per worker. It needs
+care: chunks are written
+before their dataset document is inserted, so it is only treated as orphaned
+once it is older than RECLAIM_GRACE_SECONDS (an ingest still writing it
+would be newer).
+"""
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from pymongo.errors import DuplicateKeyError
+
+from database import (
+    get_chart_results_collection,
+    get_dataset_chunks_collection,
+    get_dataset_samples_collection,
+    get_datasets_collection,
+    get_leases_collection
+)
+
+RECLAIM_INTERVAL = float(os.getenv("RECLAIM_INTERVAL", "300"))
+RECLAIM_BATCH_SIZE = int(os.getenv("RECLAIM_BATCH_SIZE", "20"))
+RECLAIM_PAUSE = float(os.getenv("RECLAIM_PAUSE", "0.2"))
+RECLAIM_GRACE_SECONDS = int(os.getenv("RECLAIM_GRACE_SECONDS", str(6 * 3600)))
+RECLAIM_LOOKUP_BATCH = 500
+RECLAIM_LEASE = "storage_reclaimer"
+
+
+class StorageReclaimer:
+    """Periodic, throttled removal of chunks and samples of deleted datasets"""
+
+    def __init__(self, interval: float = RECLAIM_INTERVAL, batch_size: int = RECLAIM_BATCH_SIZE,
+                 pause: float = RECLAIM_PAUSE, grace_seconds: int = RECLAIM_GRACE_SECONDS):
+        self.interval = interval
+        self.batch_size = batch_size
+        self.pause = pause
+        self.grace = timedelta(seconds=grace_seconds)
+        self.chunks_reclaimed = 0
+        self.samples_reclaimed = 0
+        self.last_run: Optional[datetime] = None
+        self.last_scan: Optional[datetime] = None
+        # Held for two intervals, so a dead holder is replaced within two passes
+        self.lease_duration = timedelta(seconds=2 * interval)
+        self._owner = uuid.uuid4().hex
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._pending = set()
+
+    async def start(self):
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    def schedule(self, dataset_ids):
+        """Reclaim the storage of deleted datasets soon, without the grace period"""
+        self._pending.update(dataset_ids)
+        if self._wakeup:
+            self._wakeup.set()
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"⚠️ Warning: Storage reclamation failed: {e}")
+
+    async def _orphans(self, collection) -> list:
+        """Dataset ids referenced by `collection` whose dataset document is gone"""
+        datasets = get_datasets_collection()
+        referenced = await collection.distinct("dataset_id")
+        orphans = []
+        for offset in range(0, len(referenced), RECLAIM_LOOKUP_BATCH):
+            batch = referenced[offset:offset + RECLAIM_LOOKUP_BATCH]
+            cursor = datasets.find({"_id": {"$in": batch}}, {"_id": 1})
+            existing = {doc["_id"] async for doc in cursor}
+            orphans.extend(dataset_id for dataset_id in batch if dataset_id not in existing)
+        return orphans
+
+    async def _acquire_lease(self) -> bool:
+        """Take or renew the lease that elects one orphan scanner across processes"""
+        now = datetime.now(timezone.utc)
+        try:
+            await get_leases_collection().find_one_and_update(
+                {"_id": RECLAIM_LEASE, "$or": [{"owner": self._owner}, {"expires_at": {"$lte": now}}]},
+                {"$set": {"owner": self._owner, "expires_at": now + self.lease_duration}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            return False  # Another process holds an unexpired lease
+        return True
+
+    def _settled(self, object_id, now: datetime) -> bool:
+        return object_id.generation_time <= now - self.grace
+
+    async def _reclaim(self, dataset_id):
+        """Delete a dataset's chunks in throttled batches, then its sample and saved chart results"""
+        chunks = get_dataset_chunks_collection()
+        samples = get_dataset_samples_collection()
+        while True:
+            cursor = chunks.find({"dataset_id": dataset_id}, {"_id": 1}).limit(self.batch_size)
+            ids = [doc["_id"] async for doc in cursor]
+            if not ids:
+                break
+            result = await chunks.delete_many({"_id": {"$in": ids}})
+            self.chunks_reclaimed += result.deleted_count
+            await asyncio.sleep(self.pause)
+        result = await samples.delete_many({"dataset_id": dataset_id})
+        self.samples_reclaimed += result.deleted_count
+        await get_chart_results_collection().delete_many({"dataset_id": dataset_id})
+
+    async def run_once(self):
+        """One reclamation pass: explicitly deleted datasets, then any orphans if this process holds the lease"""
+        chunks = get_dataset_chunks_collection()
+        samples = get_dataset_samples_collection()
+
+        while self._pending:
+            await self._reclaim(self._pending.pop())
+        self.last_run = datetime.utcnow()
+
+        if not await self._acquire_lease():
+            return
+
+        now = datetime.now(timezone.utc)
+        for dataset_id in await self._orphans(chunks):
+            # The last chunk written tells whether an ingest may still be running
+            newest = await chunks.find_one(
+                {"dataset_id": dataset_id}, {"_id": 1}, sort=[("start_row", -1)]
+            )
+            if newest and self._settled(newest["_id"], now):
+                await self._reclaim(dataset_id)
+
+        for dataset_id in await self._orphans(samples):
+            if self._settled(dataset_id, now):
+                await self._reclaim(dataset_id)
+
+        self.last_scan = datetime.utcnow()
+
+    def stats(self) -> dict:
+        return {
+            "chunks_reclaimed": self.chunks_reclaimed,
+            "samples_reclaimed": self.samples_reclaimed,
+            "pending": len(self._pending),
+            "last_run": self.last_run.isoformat() if self.last_run else None,
+            "last_scan": self.last_scan.isoformat() if self.last_scan else None,
+        }
+
+
+storage_reclaimer = StorageReclaimer()
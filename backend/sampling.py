@@ -0,0 +1,73 @@
+"""
+Ingest-time reservoir sampling
+Every dataset keeps a uniform random sample of up to SAMPLE_SIZE rows in the
+dataset_samples collection, built with reservoir sampling (Algorithm R) while
+the rows stream through the writer. Approximate summaries answer from it.
+"""
+import os
+from typing import List, Optional
+
+import numpy as np
+from bson import ObjectId
+
+from database import get_dataset_samples_collection
+
+SAMPLE_SIZE = int(os.getenv("SAMPLE_SIZE", "5000"))
+
+
+class Reservoir:
+    """Uniform fixed-size sample over a stream of rows"""
+
+    def __init__(self, size: int = SAMPLE_SIZE, rows: Optional[List[dict]] = None, seen: int = 0):
+        self.size = size
+        self.rows = list(rows or [])
+        self.seen = seen
+        self._rng = np.random.default_rng()
+
+    def offer(self, records: List[dict]):
+        """Feed a batch of rows through the reservoir"""
+        if not records:
+            return
+
+        # Fill phase: the first `size` rows are always kept
+        free = max(self.size - len(self.rows), 0)
+        self.rows.extend(records[:free])
+        self.seen += min(free, len(records))
+        rest = records[free:]
+        if not rest:
+            return
+
+        # Replacement phase: row t (0-based) replaces a random slot with
+        # probability size / (t + 1)
+        positions = np.arange(self.seen, self.seen + len(rest))
+        slots = self._rng.integers(0, positions + 1)
+        for i in np.flatnonzero(slots < self.size):
+            self.rows[slots[i]] = rest[i]
+        self.seen += len(rest)
+
+
+async def save_sample(dataset_id: ObjectId, reservoir: Reservoir):
+    """Store (or replace) the sample of a dataset"""
+    samples = get_dataset_samples_collection()
+    await samples.replace_one(
+        {"dataset_id": dataset_id},
+        {
+            "dataset_id": dataset_id,
+            "rows": reservoir.rows,
+            "sample_size": len(reservoir.rows),
+            "population": reservoir.seen,
+        },
+        upsert=True
+    )
+
+
+async def load_sample(dataset_id: ObjectId) -> Optional[dict]:
+    """Return the stored sample document of a dataset, if any"""
+    samples = get_dataset_samples_collection()
+    return await samples.find_one({"dataset_id": dataset_id})
+
+
+async def delete_sample(dataset_id: ObjectId):
+    """Remove the stored sample of a dataset"""
+    samples = get_dataset_samples_collection()
+    await samples.delete_many({"dataset_id": dataset_id})
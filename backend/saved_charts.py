@@ -0,0 +1,98 @@
+"""
+Saved charts
+Chart definitions a user saved are computed for every dataset they apply to
+once the dataset is stored (by a direct upload or a background ingest job),
+and the results are kept in chart_results so a dashboard opens without
+aggregating. Charts saved later, or results from an older version of the
+dataset, are computed when the dashboard first asks for them; a dashboard
+opened while a chart is still being precomputed waits for that computation
+instead of starting its own.
+"""
+from datetime import datetime
+from typing import List
+
+from fastapi import HTTPException, Response
+
+from admission import summary_admission
+from coalescing import request_coalescer
+from database import get_chart_definitions_collection, get_chart_results_collection
+from expressions import RowTransform
+from summaries import compute_histogram, compute_summary
+
+MAX_SAVED_CHARTS = 50  # per user
+
+
+def chart_definition_applies(definition: dict, columns: List[str]) -> bool:
+    """Whether every column a saved chart reads exists in a dataset"""
+    needed = [definition["column"]]
+    if definition.get("value_column"):
+        needed.append(definition["value_column"])
+    transform = RowTransform(definition.get("filter"))
+    return all(column in columns for column in transform.source_columns(needed))
+
+
+async def materialize_chart(dataset: dict, definition: dict) -> dict:
+    """Compute one saved chart for a dataset and store the result"""
+    key = (
+        "chart", dataset["user_email"], str(dataset["_id"]), dataset.get("version", 1),
+        str(definition["_id"])
+    )
+    return await request_coalescer.run(key, lambda: _compute_chart(dataset, definition))
+
+
+async def _compute_chart(dataset: dict, definition: dict) -> dict:
+    transform = RowTransform(definition.get("filter"))
+    data, error = None, None
+    try:
+        if definition["aggregation"] == "histogram":
+            data = await compute_histogram(
+                dataset, definition["column"], definition.get("binning", "width"),
+                definition.get("bins", 20), Response(), transform
+            )
+        else:
+            data = await compute_summary(
+                dataset, definition["column"], definition["aggregation"],
+                definition.get("value_column"), False, Response(), transform
+            )
+    except HTTPException as e:
+        # Stored too, so a chart that cannot be drawn is not retried on every visit
+        error = e.detail
+    except Exception as e:
+        print(f"⚠️ Warning: Could not compute saved chart {definition['_id']}: {e}")
+        error = "Could not compute this chart"
+
+    result = {
+        "dataset_id": dataset["_id"],
+        "definition_id": definition["_id"],
+        "user_email": dataset["user_email"],
+        "version": dataset.get("version", 1),
+        "data": data,
+        "error": error,
+        "computed_at": datetime.utcnow()
+    }
+    chart_results = get_chart_results_collection()
+    await chart_results.replace_one(
+        {"dataset_id": dataset["_id"], "definition_id": definition["_id"]}, result, upsert=True
+    )
+    return result
+
+
+async def applicable_chart_definitions(dataset: dict) -> List[dict]:
+    """Saved charts of the dataset's owner that apply to the dataset"""
+    chart_definitions = get_chart_definitions_collection()
+    definitions = await chart_definitions.find(
+        {"user_email": dataset["user_email"]}
+    ).sort("created_at", 1).to_list(MAX_SAVED_CHARTS)
+
+    return [
+        definition for definition in definitions
+        if chart_definition_applies(definition, dataset["columns"])
+    ]
+
+
+async def materialize_saved_charts(dataset: dict, definitions: List[dict]):
+    """Compute and store saved charts for a newly stored dataset, one at a time"""
+    for definition in definitions:
+        # Waits for a summary slot rather than skipping charts when busy
+        async with summary_admission.slot(dataset["user_email"], wait=True):
+            await materialize_chart(dataset, definition)
@@ -0,0 +1,321 @@
+"""
+Node-wide columnar dataset cache shared by all uvicorn workers
+Decoded datasets are written once as one .npy file per column under
+DATASET_CACHE_DIR (tmpfs at /dev/shm by default) and memory-mapped read-only
+by every worker, so the same hot dataset is fetched from MongoDB and held in
+memory once per node rather than once per process.
+
+- Numeric columns are stored as-is and mapped zero-copy.
+- Other columns are stored as int32 codes plus a small label file; decoding
+  them copies pointers only.
+
+Frames read from the cache record the bytes they own outside the mapping in
+`df.attrs["private_bytes"]`, so per-process caches can charge only those.
+
+Readers hold a shared flock on the entry's ref file while they use it; the
+evictor only removes entries it can lock exclusively, so entries in use are
+never evicted. Locks are released by the kernel if a worker dies. Entries
+are keyed by dataset id and version, so appends produce a new entry and the
+old version is evicted first.
+
+/dev/shm is shared by every local user, so the cache directory is created
+with mode 0700 and only used when it is owned by this uid and closed to
+group and others. Nothing in it is unpickled: labels are stored as JSON.
+"""
+import json
+import os
+import shutil
+import stat
+import sys
+import tempfile
+from datetime import date, datetime, time
+from contextlib import contextmanager
+from typing import Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from starlette.concurrency import run_in_threadpool
+
+from storage import load_dataframe, with_inline_rows
+
+try:
+    import fcntl
+except ImportError:  # Windows: no flock, so the cache is disabled
+    fcntl = None
+
+DEFAULT_CACHE_DIR = "/dev/shm/dataviz-datasets" if os.path.isdir("/dev/shm") else os.path.join(
+    tempfile.gettempdir(), "dataviz-datasets"
+)
+DATASET_CACHE_DIR = os.getenv("DATASET_CACHE_DIR", DEFAULT_CACHE_DIR)
+DATASET_CACHE_BYTES = int(os.getenv("DATASET_CACHE_BYTES", str(1 << 30)))
+DATASET_CACHE_ENABLED = os.getenv("DATASET_CACHE_ENABLED", "true").lower() == "true" and fcntl is not None
+
+MANIFEST = "manifest.json"
+LABELS = "labels.json"
+REF = "ref"
+KIND_VALUES = "values"
+KIND_CODES = "codes"
+
+
+def _entry_name(dataset: dict) -> str:
+    return f"{dataset['_id']}-v{dataset.get('version', 1)}"
+
+
+def _noop():
+    pass
+
+
+def _entry_size(path: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def _private_dir(path: str) -> bool:
+    """Create `path` as a 0700 directory; True only if it is ours and private"""
+    try:
+        os.makedirs(path, mode=0o700, exist_ok=True)
+        info = os.lstat(path)
+    except OSError:
+        return False
+    return (
+        stat.S_ISDIR(info.st_mode)
+        and info.st_uid == os.getuid()
+        and not info.st_mode & (stat.S_IRWXG | stat.S_IRWXO)
+    )
+
+
+def _encode_label(value):
+    """JSON form of a column label; dates and times are tagged"""
+    if isinstance(value, np.generic):
+        value = value.item()
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    for kind in (datetime, date, time):
+        if isinstance(value, kind):
+            return {"$" + kind.__name__: value.isoformat()}
+    raise TypeError(f"Cannot cache values of type {type(value).__name__}")
+
+
+def _decode_label(value: dict):
+    for kind in (datetime, date, time):
+        if "$" + kind.__name__ in value:
+            return kind.fromisoformat(value["$" + kind.__name__])
+    return value
+
+
+class SharedDatasetCache:
+    """Memory-mapped dataset cache with cross-process reference tracking"""
+
+    def __init__(self, root: str = DATASET_CACHE_DIR, budget: int = DATASET_CACHE_BYTES,
+                 enabled: bool = DATASET_CACHE_ENABLED):
+        self.root = root
+        self.budget = budget
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._root_ok = None
+
+    def _usable(self) -> bool:
+        """Whether the cache is enabled and its directory is safe to use"""
+        if not self.enabled:
+            return False
+        if self._root_ok is None:
+            self._root_ok = _private_dir(self.root)
+            if not self._root_ok:
+                print(f"⚠️ Warning: Dataset cache disabled: {self.root} must be a directory "
+                      "owned by this user with no group or other permissions")
+        return self._root_ok
+
+    @contextmanager
+    def _node_lock(self):
+        """Serialize inserts and evictions across all workers on the node"""
+        with open(os.path.join(self.root, ".lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _acquire(self, name: str) -> Optional[int]:
+        """Take a shared reference on an entry; None if it is not cached"""
+        ref_path = os.path.join(self.root, name, REF)
+        try:
+            fd = os.open(ref_path, os.O_RDONLY)
+        except FileNotFoundError:
+            return None
+        fcntl.flock(fd, fcntl.LOCK_SH)
+        try:
+            # The evictor may have removed the entry before we got the lock
+            if os.stat(ref_path).st_ino == os.fstat(fd).st_ino:
+                os.utime(os.path.join(self.root, name))  # LRU order
+                return fd
+        except FileNotFoundError:
+            pass
+        os.close(fd)
+        return None
+
+    def _try_remove(self, name: str) -> bool:
+        """Remove an entry unless some worker holds a reference to it"""
+        path = os.path.join(self.root, name)
+        try:
+            fd = os.open(os.path.join(path, REF), os.O_RDONLY)
+        except FileNotFoundError:
+            shutil.rmtree(path, ignore_errors=True)
+            return True
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(fd)
+            return False
+        shutil.rmtree(path, ignore_errors=True)
+        os.close(fd)
+        return True
+
+    def _entries(self) -> List[os.DirEntry]:
+        if not os.path.isdir(self.root):
+            return []
+        return [e for e in os.scandir(self.root) if e.is_dir() and not e.name.startswith(".")]
+
+    def _evict(self, incoming: int, keep: str):
+        """Drop stale versions, then least recently used entries, to fit `incoming` bytes"""
+        dataset_id = keep.rsplit("-v", 1)[0]
+        entries = []
+        for entry in self._entries():
+            if entry.name == keep:
+                continue
+            if entry.name.rsplit("-v", 1)[0] == dataset_id:
+                if self._try_remove(entry.name):
+                    self.evictions += 1
+                continue
+            entries.append((entry.stat().st_mtime, entry.name, _entry_size(entry.path)))
+
+        total = sum(size for _, _, size in entries)
+        for _, name, size in sorted(entries):
+            if total + incoming <= self.budget:
+                break
+            if self._try_remove(name):
+                self.evictions += 1
+                total -= size
+
+    def _write(self, name: str, df: pd.DataFrame):
+        """Encode a DataFrame into a new entry (runs in a worker thread)"""
+        staging = tempfile.mkdtemp(prefix=".staging-", dir=self.root)
+        try:
+            kinds, labels = [], {}
+            for i, column in enumerate(df.columns):
+                series = df[column]
+                if pd.api.types.is_numeric_dtype(series) or pd.api.types.is_bool_dtype(series):
+                    np.save(os.path.join(staging, f"{i}.npy"), series.to_numpy())
+                    kinds.append(KIND_VALUES)
+                else:
+                    codes, uniques = pd.factorize(series, use_na_sentinel=False)
+                    np.save(os.path.join(staging, f"{i}.npy"), codes.astype(np.int32))
+                    labels[str(i)] = [_encode_label(value) for value in uniques]
+                    kinds.append(KIND_CODES)
+            with open(os.path.join(staging, LABELS), "w") as f:
+                json.dump(labels, f)
+            with open(os.path.join(staging, MANIFEST), "w") as f:
+                json.dump({"columns": [str(c) for c in df.columns], "kinds": kinds, "rows": len(df)}, f)
+            open(os.path.join(staging, REF), "w").close()
+
+            size = _entry_size(staging)
+            if size > self.budget:
+                return
+            with self._node_lock():
+                if os.path.isdir(os.path.join(self.root, name)):
+                    return  # Another worker cached it first
+                self._evict(size, name)
+                os.rename(staging, os.path.join(self.root, name))
+                staging = None
+        finally:
+            if staging:
+                shutil.rmtree(staging, ignore_errors=True)
+
+    def _read(self, name: str, columns: Optional[List[str]]) -> pd.DataFrame:
+        """Build a DataFrame over an entry's memory-mapped column files"""
+        path = os.path.join(self.root, name)
+        with open(os.path.join(path, MANIFEST)) as f:
+            manifest = json.load(f)
+        labels = None
+        arrays = {}
+        private = 0  # Decoded columns live outside the mapping
+        for i, column in enumerate(manifest["columns"]):
+            if columns is not None and column not in columns:
+                continue
+            data = np.load(os.path.join(path, f"{i}.npy"), mmap_mode="r", allow_pickle=False)
+            if manifest["kinds"][i] == KIND_CODES:
+                if labels is None:
+                    with open(os.path.join(path, LABELS)) as f:
+                        labels = json.load(f, object_hook=_decode_label)
+                values = np.empty(len(labels[str(i)]), dtype=object)
+                values[:] = labels[str(i)]
+                data = values[data]
+                private += data.nbytes + values.nbytes + sum(sys.getsizeof(v) for v in values)
+            arrays[column] = data
+        if columns is not None:
+            arrays = {c: arrays[c] for c in columns if c in arrays}
+        df = pd.DataFrame(arrays, copy=False)
+        df.attrs["private_bytes"] = private
+        return df
+
+    async def pin(self, dataset: dict) -> Tuple[pd.DataFrame, Callable[[], None]]:
+        """Return the whole dataset as a DataFrame plus a callable releasing it
+
+        The entry cannot be evicted until the release callable runs. The
+        DataFrame may be backed by read-only shared memory: do not modify it
+        in place.
+        """
+        if not self._usable():
+            return await load_dataframe(await with_inline_rows(dataset)), _noop
+
+        name = _entry_name(dataset)
+        fd = await run_in_threadpool(self._acquire, name)
+        if fd is None:
+            self.misses += 1
+            df = await load_dataframe(await with_inline_rows(dataset))
+            try:
+                await run_in_threadpool(self._write, name, df)
+            except TypeError:
+                return df, _noop  # Values JSON cannot hold: serve without caching
+            fd = await run_in_threadpool(self._acquire, name)
+            if fd is None:
+                # Too large to cache (or evicted straight away): serve it directly
+                return df, _noop
+        else:
+            self.hits += 1
+
+        try:
+            df = await run_in_threadpool(self._read, name, None)
+        except BaseException:
+            os.close(fd)
+            raise
+        return df, lambda: os.close(fd)
+
+    def drop(self, dataset_id) -> None:
+        """Remove every cached version of a dataset (e.g. after it is deleted)
+
+        Workers still reading an entry keep their mappings; the memory is
+        freed when they finish.
+        """
+        if not self._usable():
+            return
+        prefix = f"{dataset_id}-v"
+        with self._node_lock():
+            for entry in self._entries():
+                if entry.name.startswith(prefix):
+                    shutil.rmtree(entry.path, ignore_errors=True)
+
+    def stats(self) -> dict:
+        entries = self._entries() if self._usable() else []
+        return {
+            "enabled": self._usable(),
+            "entries": len(entries),
+            "bytes": sum(_entry_size(e.path) for e in entries),
+            "budget_bytes": self.budget,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+dataset_cache = SharedDatasetCache()
@@ -0,0 +1,239 @@
+"""
+Per-column sketches built during ingestion
+- HyperLogLog (2^HLL_PRECISION one-byte registers) for distinct counts
+- t-digest (merging variant, k1 scale) for quantiles and histograms of the
+  numeric values in a column
+
+Both are mergeable, vectorized with numpy, and serialized to a few KB per
+column so they can live on the dataset document and answer quantile and
+cardinality questions without touching row data.
+"""
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+HLL_PRECISION = 12
+TDIGEST_COMPRESSION = 200
+
+
+class HyperLogLog:
+    """Distinct-count sketch over 64-bit hashes"""
+
+    def __init__(self, registers: Optional[np.ndarray] = None, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.m = 1 << precision
+        self.registers = registers if registers is not None else np.zeros(self.m, dtype=np.uint8)
+
+    def add_hashes(self, hashes: np.ndarray):
+        if len(hashes) == 0:
+            return
+        hashes = hashes.astype(np.uint64, copy=False)
+        tail_bits = 64 - self.precision
+        index = (hashes >> np.uint64(tail_bits)).astype(np.int64)
+        tail = hashes & np.uint64((1 << tail_bits) - 1)
+        # Position of the leftmost 1-bit in the tail; tails fit in a float64
+        # mantissa, so frexp's exponent is the exact bit length
+        bit_length = np.frexp(tail.astype(np.float64))[1]
+        rank = (tail_bits - bit_length + 1).astype(np.uint8)
+        np.maximum.at(self.registers, index, rank)
+
+    def merge(self, other: "HyperLogLog"):
+        np.maximum(self.registers, other.registers, out=self.registers)
+
+    def estimate(self) -> int:
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            # Small-range correction (linear counting)
+            return int(round(m * math.log(m / zeros)))
+        return int(round(raw))
+
+    def to_bytes(self) -> bytes:
+        return self.registers.tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HyperLogLog":
+        registers = np.frombuffer(data, dtype=np.uint8).copy()
+        return cls(registers, int(math.log2(len(registers))))
+
+
+class TDigest:
+    """Mergeable quantile sketch (centroid means and weights)"""
+
+    def __init__(self, means=None, weights=None, compression: int = TDIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.asarray(means if means is not None else [], dtype=np.float64)
+        self.weights = np.asarray(weights if weights is not None else [], dtype=np.float64)
+        self.min = float(self.means.min()) if len(self.means) else None
+        self.max = float(self.means.max()) if len(self.means) else None
+
+    @property
+    def count(self) -> float:
+        return float(self.weights.sum())
+
+    def _k(self, q: np.ndarray) -> np.ndarray:
+        # k1 scale function shifted to start at 0; one unit of k per centroid
+        # gives small centroids in the tails and large ones in the middle
+        return self.compression / (2 * math.pi) * (np.arcsin(2 * q - 1) + math.pi / 2)
+
+    def _compress(self, means: np.ndarray, weights: np.ndarray):
+        order = np.argsort(means, kind="mergesort")
+        means, weights = means[order], weights[order]
+        total = weights.sum()
+        q_left = (np.cumsum(weights) - weights) / total
+        bucket = np.floor(self._k(np.clip(q_left, 0.0, 1.0))).astype(np.int64)
+        new_weights = np.bincount(bucket, weights=weights)
+        new_sums = np.bincount(bucket, weights=weights * means)
+        keep = new_weights > 0
+        self.weights = new_weights[keep]
+        self.means = new_sums[keep] / self.weights
+
+    def add(self, values: np.ndarray):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        low, high = float(values.min()), float(values.max())
+        self.min = low if self.min is None else min(self.min, low)
+        self.max = high if self.max is None else max(self.max, high)
+        self._compress(
+            np.concatenate([self.means, values]),
+            np.concatenate([self.weights, np.ones(len(values))]),
+        )
+
+    def merge(self, other: "TDigest"):
+        if not len(other.means):
+            return
+        self.min = other.min if self.min is None else min(self.min, other.min)
+        self.max = other.max if self.max is None else max(self.max, other.max)
+        self._compress(
+            np.concatenate([self.means, other.means]),
+            np.concatenate([self.weights, other.weights]),
+        )
+
+    def _knots(self):
+        """Cumulative weight at each centroid center, anchored at min and max"""
+        centers = np.cumsum(self.weights) - self.weights / 2
+        xs = np.concatenate([[self.min], self.means, [self.max]])
+        ws = np.concatenate([[0.0], centers, [self.count]])
+        return xs, ws
+
+    def quantile(self, q: float) -> Optional[float]:
+        if not len(self.means):
+            return None
+        xs, ws = self._knots()
+        return float(np.interp(min(max(q, 0.0), 1.0) * self.count, ws, xs))
+
+    def cdf(self, x: np.ndarray) -> np.ndarray:
+        """Fraction of values <= x"""
+        if not len(self.means):
+            return np.zeros_like(np.asarray(x, dtype=np.float64))
+        xs, ws = self._knots()
+        return np.interp(x, xs, ws, left=0.0, right=self.count) / self.count
+
+    def histogram(self, bins: int) -> List[dict]:
+        """Equal-width histogram over [min, max] estimated from the CDF"""
+        if not len(self.means):
+            return []
+        if self.min == self.max:
+            return [{"start": self.min, "end": self.max, "count": int(round(self.count))}]
+        edges = np.linspace(self.min, self.max, bins + 1)
+        cumulative = self.cdf(edges) * self.count
+        cumulative[0], cumulative[-1] = 0.0, self.count
+        counts = np.diff(cumulative)
+        return [
+            {"start": float(edges[i]), "end": float(edges[i + 1]), "count": int(round(counts[i]))}
+            for i in range(bins)
+        ]
+
+    def to_bytes(self) -> bytes:
+        return np.stack([self.means, self.weights]).tobytes()
+
+    @classmethod
+    def from_bytes(cls, data: bytes, low: Optional[float], high: Optional[float]) -> "TDigest":
+        packed = np.frombuffer(data, dtype=np.float64).reshape(2, -1)
+        digest = cls(packed[0].copy(), packed[1].copy())
+        digest.min, digest.max = low, high
+        return digest
+
+
+class ColumnSketch:
+    """Distinct-count and quantile sketches for one column"""
+
+    def __init__(self, column: str, count: int = 0, hll: Optional[HyperLogLog] = None,
+                 digest: Optional[TDigest] = None):
+        self.column = column
+        self.count = count
+        self.hll = hll or HyperLogLog()
+        self.digest = digest or TDigest()
+
+    def update(self, series: pd.Series):
+        # Empty strings are the stored form of missing values
+        values = series[series != ''].infer_objects()
+        self.count += len(values)
+        if len(values) == 0:
+            return
+
+        if pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+            # Hash numbers as float64 so 3 and 3.0 count as one value across batches
+            numeric = values.astype(np.float64)
+            self.hll.add_hashes(pd.util.hash_pandas_object(numeric, index=False).to_numpy())
+            self.digest.add(numeric.to_numpy())
+            return
+
+        self.hll.add_hashes(pd.util.hash_pandas_object(values.astype(str), index=False).to_numpy())
+        if pd.api.types.infer_dtype(values, skipna=True) != "string":
+            # Mixed column: sketch whatever parses as a number
+            numeric = pd.to_numeric(values, errors="coerce")
+            self.digest.add(numeric.to_numpy(dtype=np.float64, na_value=np.nan))
+
+    def merge(self, other: "ColumnSketch"):
+        self.count += other.count
+        self.hll.merge(other.hll)
+        self.digest.merge(other.digest)
+
+    def to_doc(self) -> dict:
+        return {
+            "column": self.column,
+            "count": self.count,
+            "hll": self.hll.to_bytes(),
+            "numeric_count": int(self.digest.count),
+            "min": self.digest.min,
+            "max": self.digest.max,
+            "tdigest": self.digest.to_bytes(),
+        }
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "ColumnSketch":
+        return cls(
+            doc["column"],
+            doc["count"],
+            HyperLogLog.from_bytes(doc["hll"]),
+            TDigest.from_bytes(doc["tdigest"], doc.get("min"), doc.get("max")),
+        )
+
+
+class SketchSet:
+    """Sketches for every column of a dataset"""
+
+    def __init__(self, sketches: Optional[Dict[str, ColumnSketch]] = None):
+        self.sketches = sketches or {}
+
+    def update(self, df: pd.DataFrame):
+        """Fold a cleaned DataFrame batch into the column sketches"""
+        for column in df.columns:
+            name = str(column)
+            if name not in self.sketches:
+                self.sketches[name] = ColumnSketch(name)
+            self.sketches[name].update(df[column])
+
+    def to_docs(self) -> List[dict]:
+        return [sketch.to_doc() for sketch in self.sketches.values()]
+
+    @classmethod
+    def from_docs(cls, docs: List[dict]) -> "SketchSet":
+        return cls({doc["column"]: ColumnSketch.from_doc(doc) for doc in docs or []})
@@ -0,0 +1,212 @@
+"""
+Chunked row storage
+Dataset rows are stored in the dataset_chunks collection in batches of at most
+CHUNK_SIZE rows and CHUNK_MAX_BYTES of BSON, keyed by (dataset_id, start_row).
+This keeps every document well under MongoDB's 16 MB limit, however wide the
+rows, and lets pagination fetch only the chunks it needs.
+
+Datasets uploaded before chunked storage keep their rows inline in the
+document's `data` field; every reader here handles both layouts.
+"""
+import os
+from typing import List, Optional
+
+import bson
+import pandas as pd
+from bson import ObjectId
+from starlette.concurrency import run_in_threadpool
+
+from database import get_dataset_chunks_collection, get_datasets_collection
+from sampling import Reservoir, delete_sample
+from sketches import SketchSet
+
+CHUNK_SIZE = int(os.getenv("CHUNK_SIZE", "5000"))
+CHUNK_MAX_BYTES = int(os.getenv("CHUNK_MAX_BYTES", str(8 << 20)))
+STORAGE_CHUNKED = "chunked"
+
+
+def clean_frame(df: pd.DataFrame) -> pd.DataFrame:
+    """Make a parsed DataFrame storable (no NaN, no datetime objects)"""
+    df = df.fillna('')  # Replace NaN with empty string
+    for col in df.columns:
+        if pd.api.types.is_datetime64_any_dtype(df[col]):
+            df[col] = df[col].astype(str)
+    return df
+
+
+class SchemaMismatchError(ValueError):
+    """Raised when a batch's columns differ from the dataset's columns"""
+
+
+def is_chunked(dataset: dict) -> bool:
+    """Whether a dataset document keeps its rows in dataset_chunks"""
+    return dataset.get("storage") == STORAGE_CHUNKED
+
+
+class DatasetWriter:
+    """Appends DataFrame batches to a dataset's chunked row storage"""
+
+    def __init__(self, dataset_id: ObjectId, start_row: int = 0, next_seq: int = 0,
+                 columns: Optional[List[str]] = None, reservoir: Optional[Reservoir] = None,
+                 sketches: Optional[SketchSet] = None):
+        self.dataset_id = dataset_id
+        self.row_count = start_row
+        self.next_seq = next_seq
+        self.columns = columns
+        self.rows_written = 0
+        self.reservoir = reservoir or Reservoir()
+        self.sketches = sketches or SketchSet()
+
+    def _prepare(self, df: pd.DataFrame) -> List[dict]:
+        """Clean a batch, fold it into the column sketches and convert to row dicts"""
+        df = clean_frame(df)
+        self.sketches.update(df)
+        return df.to_dict('records')
+
+    @staticmethod
+    def _split(records: List[dict]) -> List[List[dict]]:
+        """Cut rows into chunks of at most CHUNK_SIZE rows and CHUNK_MAX_BYTES
+
+        Chunks that encode too large are halved until they fit; a single row
+        is never split.
+        """
+        # A stack with the next rows on top, so chunks come out in row order
+        pending = [records[offset:offset + CHUNK_SIZE] for offset in range(0, len(records), CHUNK_SIZE)][::-1]
+        chunks = []
+        while pending:
+            rows = pending.pop()
+            if len(rows) > 1 and len(bson.encode({"rows": rows})) > CHUNK_MAX_BYTES:
+                half = len(rows) // 2
+                pending.extend([rows[half:], rows[:half]])
+            else:
+                chunks.append(rows)
+        return chunks
+
+    async def write(self, df: pd.DataFrame):
+        """Store one parsed batch, splitting it into size-limited chunks"""
+        df = df.rename(columns=str)
+        if self.columns is None:
+            self.columns = list(df.columns)
+        elif list(df.columns) != self.columns:
+            missing = [c for c in self.columns if c not in df.columns]
+            extra = [c for c in df.columns if c not in self.columns]
+            if missing or extra or df.columns.duplicated().any():
+                raise SchemaMismatchError(
+                    f"Columns do not match the dataset (missing: {missing}, unexpected: {extra})"
+                )
+            df = df[self.columns]
+        if df.empty:
+            return
+
+        records = await run_in_threadpool(self._prepare, df)
+        self.reservoir.offer(records)
+        chunk_docs = []
+        for rows in await run_in_threadpool(self._split, records):
+            chunk_docs.append({
+                "dataset_id": self.dataset_id,
+                "seq": self.next_seq,
+                "start_row": self.row_count,
+                "row_count": len(rows),
+                "rows": rows,
+            })
+            self.next_seq += 1
+            self.row_count += len(rows)
+            self.rows_written += len(rows)
+
+        chunks = get_dataset_chunks_collection()
+        await chunks.insert_many(chunk_docs, ordered=False)
+
+
+async def with_inline_rows(dataset: dict) -> dict:
+    """Return the dataset document including inline rows for pre-chunking datasets
+
+    Readers fetch documents without the `data` field first; only datasets that
+    still store rows inline need the second, heavier fetch.
+    """
+    if is_chunked(dataset) or "data" in dataset:
+        return dataset
+    datasets = get_datasets_collection()
+    full = await datasets.find_one({"_id": dataset["_id"]}, {"data": 1})
+    return {**dataset, "data": (full or {}).get("data", [])}
+
+
+def _rows_projection(columns: Optional[List[str]]) -> dict:
+    """Projection fetching only some fields of each stored row, when expressible"""
+    if columns is None or any("." in c or c.startswith("$") for c in columns):
+        return {"rows": 1, "_id": 0}
+    return {**{f"rows.{c}": 1 for c in columns}, "_id": 0}
+
+
+async def iter_row_chunks(dataset: dict, columns: Optional[List[str]] = None):
+    """Yield a dataset's rows as lists of records, one stored chunk at a time
+
+    With `columns`, chunked datasets only transfer those fields of each row
+    (rows may then lack other keys).
+    """
+    if not is_chunked(dataset):
+        rows = dataset.get("data", [])
+        for offset in range(0, len(rows), CHUNK_SIZE):
+            yield rows[offset:offset + CHUNK_SIZE]
+        return
+
+    chunks = get_dataset_chunks_collection()
+    # Chunks past row_count belong to an append that has not committed yet
+    cursor = chunks.find(
+        {"dataset_id": dataset["_id"], "start_row": {"$lt": dataset["row_count"]}},
+        _rows_projection(columns)
+    ).sort("start_row", 1)
+    async for chunk in cursor:
+        yield chunk["rows"]
+
+
+async def fetch_rows(dataset: dict, start: int, end: int) -> List[dict]:
+    """Return rows [start, end) of a dataset, reading only the chunks involved"""
+    if end <= start:
+        return []
+    if not is_chunked(dataset):
+        return dataset.get("data", [])[start:end]
+    end = min(end, dataset["row_count"])
+
+    chunks = get_dataset_chunks_collection()
+    # Chunks never exceed CHUNK_SIZE rows, so the one holding `start` begins
+    # less than CHUNK_SIZE rows before it
+    cursor = chunks.find(
+        {
+            "dataset_id": dataset["_id"],
+            "start_row": {"$gt": start - CHUNK_SIZE, "$lt": end},
+        },
+        {"rows": 1, "start_row": 1, "_id": 0}
+    ).sort("start_row", 1)
+
+    rows = []
+    async for chunk in cursor:
+        first = chunk["start_row"]
+        rows.extend(chunk["rows"][max(start - first, 0):max(end - first, 0)])
+    return rows
+
+
+async def load_dataframe(dataset: dict, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """Materialize a whole dataset (or only some of its columns) as a DataFrame"""
+    if not is_chunked(dataset):
+        df = await run_in_threadpool(pd.DataFrame, dataset.get("data", []))
+        return df if columns is None else df.reindex(columns=columns)
+
+    records = []
+    async for rows in iter_row_chunks(dataset, columns):
+        records.extend(rows)
+    if not records:
+        return pd.DataFrame(columns=columns if columns is not None else dataset.get("columns", []))
+    return await run_in_threadpool(pd.DataFrame, records, columns=columns)
+
+
+async def truncate_rows(dataset_id: ObjectId, row_count: int):
+    """Remove chunks at or past `row_count`, undoing a failed append"""
+    chunks = get_dataset_chunks_collection()
+    await chunks.delete_many({"dataset_id": dataset_id, "start_row": {"$gte": row_count}})
+
+
+async def delete_rows(dataset_id: ObjectId):
+    """Remove all stored row chunks and the row sample of a dataset"""
+    chunks = get_dataset_chunks_collection()
+    await chunks.delete_many({"dataset_id": dataset_id})
+    await delete_sample(dataset_id)
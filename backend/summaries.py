@@ -0,0 +1,178 @@
+"""
+Chart aggregations over stored datasets
+The exact, approximate (reservoir sample) and histogram computations behind
+summary requests. They are used by the summary routes and when saved charts
+are materialized, so they report errors as HTTPException and take the
+Response whose headers (sample sizes, bins used) the caller returns.
+"""
+from typing import List, Optional
+
+import pandas as pd
+from fastapi import HTTPException, Response, status
+from starlette.concurrency import run_in_threadpool
+
+from aggregations import (
+    RunningHistogram, aggregate, aggregate_sample, histogram_edges, numeric_values, to_chart_data
+)
+from database import get_datasets_collection
+from expressions import RowTransform
+from frame_cache import hot_frames
+from sampling import load_sample
+from sketches import ColumnSketch, TDigest
+from storage import iter_row_chunks, with_inline_rows
+
+MAX_HISTOGRAM_BINS = 1000
+
+
+async def compute_summary(
+    dataset: dict,
+    column: str,
+    aggregation: str,
+    value_column: Optional[str],
+    approximate: bool,
+    response: Response,
+    transform: Optional[RowTransform] = None
+):
+    """Run the aggregation behind a summary request"""
+    transform = transform or RowTransform()
+    if approximate:
+        sample_doc = await load_sample(dataset["_id"])
+        if sample_doc:
+            return await summarize_from_sample(
+                dataset, sample_doc, column, aggregation, value_column, response, transform
+            )
+
+    # Served from this worker's hot cache, then the node-wide shared cache
+    async with hot_frames.frame(dataset) as df:
+        if column not in df.columns and column not in transform.derived_names:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Column '{column}' not found in dataset"
+            )
+
+        # Perform aggregation
+        try:
+            if transform:
+                df = await run_in_threadpool(
+                    transform.apply, df, summary_columns(column, aggregation, value_column)
+                )
+            result = aggregate(df, column, aggregation, value_column)
+        except Exception as e:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Error performing aggregation: {str(e)}"
+            )
+
+    # Convert to chart-friendly format
+    chart_data = to_chart_data(result)
+    if approximate:
+        # No stored sample (older dataset), so the exact answer is returned
+        chart_data = [{**item, "error": 0.0} for item in chart_data]
+
+    return chart_data
+
+
+async def compute_histogram(
+    dataset: dict,
+    column: str,
+    binning: str,
+    bins: int,
+    response: Response,
+    transform: RowTransform
+):
+    """Histogram of a numeric column, streamed over the stored chunks
+
+    Bin edges come from the column's stored t-digest (or, with a filter or
+    derived column, from a first pass building one); a second pass counts
+    values into the bins exactly. Only `column` and the columns the transform
+    needs are read, one chunk at a time. Quantile bins with equal edges are
+    merged, so X-Histogram-Bins reports the number of bins actually used.
+    """
+    digest = None
+    if not transform:
+        datasets = get_datasets_collection()
+        doc = await datasets.find_one(
+            {"_id": dataset["_id"]}, {"sketches": {"$elemMatch": {"column": column}}}
+        )
+        if doc and doc.get("sketches"):
+            sketch = ColumnSketch.from_doc(doc["sketches"][0])
+            # Numbers stored as text are not in the digest; the first pass parses them
+            if sketch.digest.count or not sketch.count:
+                digest = sketch.digest
+
+    columns = transform.source_columns([column])
+    dataset = await with_inline_rows(dataset)
+
+    async def chunk_values():
+        async for rows in iter_row_chunks(dataset, columns):
+            df = pd.DataFrame(rows, columns=columns)
+            if transform:
+                try:
+                    df = await run_in_threadpool(transform.apply, df)
+                except Exception as e:
+                    raise HTTPException(
+                        status_code=status.HTTP_400_BAD_REQUEST,
+                        detail=f"Error performing aggregation: {str(e)}"
+                    )
+            yield await run_in_threadpool(numeric_values, df[column])
+
+    if digest is None:
+        # Legacy dataset without sketches, or values a transform produces
+        digest = TDigest()
+        async for values in chunk_values():
+            await run_in_threadpool(digest.add, values)
+
+    histogram = RunningHistogram(histogram_edges(digest, binning, bins, MAX_HISTOGRAM_BINS))
+    response.headers["X-Histogram-Bins"] = str(len(histogram.counts))
+    if len(histogram.counts):
+        async for values in chunk_values():
+            await run_in_threadpool(histogram.update, values)
+    return histogram.result()
+
+
+async def summarize_from_sample(
+    dataset: dict,
+    sample_doc: dict,
+    column: str,
+    aggregation: str,
+    value_column: Optional[str],
+    response: Response,
+    transform: RowTransform
+):
+    """Answer a summary request from a dataset's reservoir sample"""
+    if column not in dataset["columns"] and column not in transform.derived_names:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Column '{column}' not found in dataset"
+        )
+
+    sample = pd.DataFrame(sample_doc["rows"], columns=dataset["columns"])
+
+    try:
+        sample = transform.derive(sample)
+        mask = transform.mask(sample)
+        if mask is not None:
+            # Filtered-out rows stay in the sample but belong to no group, so
+            # estimates still scale by the full sample size
+            sample[column] = sample[column].where(mask)
+        chart_data = aggregate_sample(
+            sample, sample_doc["population"], column, aggregation, value_column
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Error performing aggregation: {str(e)}"
+        )
+
+    response.headers["X-Sample-Size"] = str(sample_doc["sample_size"])
+    response.headers["X-Population-Size"] = str(sample_doc["population"])
+    return chart_data
+
+
+def summary_columns(column: str, aggregation: str, value_column: Optional[str]) -> Optional[List[str]]:
+    """Columns a summary reads; None when the value column is picked from all of them"""
+    if aggregation == "count":
+        return [column]
+    if value_column:
+        return list(dict.fromkeys([column, value_column]))
+    return None
@@ -0,0 +1,48 @@
+import pandas as pd
+import pytest
+
+from aggregations import RunningAggregate, aggregate, to_chart_data
+
+
+@pytest.fixture
+def df():
+    # Blank cells are stored as '' and text can sit in a numeric column
+    return pd.DataFrame({
+        "region": ["EU", "US", "EU", "APAC", "US", "EU", "APAC", "US"],
+        "amount": [10, "", 5.5, "n/a", 3, "", "", 7],
+        "name": ["b", "a", "c", "", "d", "a", "e", "f"],
+        "score": [1, 4, 2, 8, 5, 7, 3, 6],
+    })
+
+
+def streamed(df: pd.DataFrame, column: str, aggregation: str, value_column, chunk_rows: int) -> list:
+    running = RunningAggregate(column, aggregation, value_column)
+    for offset in range(0, len(df), chunk_rows):
+        running.update(df.iloc[offset:offset + chunk_rows])
+    return running.result()
+
+
+def as_dict(chart_data: list) -> dict:
+    return {item["name"]: item["value"] for item in chart_data}
+
+
+@pytest.mark.parametrize("aggregation,value_column", [
+    ("count", None),
+    ("sum", "amount"),
+    ("average", "amount"),
+    ("avg", "amount"),
+    ("min", "score"),
+    ("max", "score"),
+    ("min", "name"),
+    ("max", "name"),
+])
+@pytest.mark.parametrize("chunk_rows", [1, 3, 100])
+def test_streamed_result_equals_aggregate(df, aggregation, value_column, chunk_rows):
+    expected = as_dict(to_chart_data(aggregate(df, "region", aggregation, value_column)))
+    assert as_dict(streamed(df, "region", aggregation, value_column, chunk_rows)) == pytest.approx(expected)
+
+
+def test_blank_and_text_values_are_ignored_by_sum_and_average(df):
+    assert aggregate(df, "region", "sum", "amount") == {"APAC": 0.0, "EU": 15.5, "US": 10.0}
+    assert aggregate(df, "region", "average", "amount") == {"EU": 7.75, "US": 5.0}
+
@@ -0,0 +1,85 @@
+import asyncio
+
+import pandas as pd
+import pytest
+
+from csv_parallel import iter_csv_ranges, shutdown_parse_pool, split_records
+
+RANGE_BYTES = 64  # Small ranges, so every file below is split several times
+
+
+@pytest.fixture(scope="module", autouse=True)
+def parse_pool():
+    yield
+    shutdown_parse_pool()
+
+
+def write(tmp_path, data: bytes) -> str:
+    path = tmp_path / "data.csv"
+    path.write_bytes(data)
+    return str(path)
+
+
+def parse_parallel(path: str) -> pd.DataFrame:
+    split = split_records(path, RANGE_BYTES)
+    assert split is not None
+
+    async def collect():
+        return [df async for df in iter_csv_ranges(path, split, batch_rows=7)]
+    return pd.concat(asyncio.run(collect()), ignore_index=True)
+
+
+def assert_matches_read_csv(path: str):
+    expected = pd.read_csv(path)
+    actual = parse_parallel(path)
+    assert list(actual.columns) == list(expected.columns)
+    pd.testing.assert_frame_equal(actual.astype(str), expected.astype(str))
+
+
+def test_plain_records(tmp_path):
+    rows = "".join(f"{i},name {i},{i * 1.5}\n" for i in range(100))
+    assert_matches_read_csv(write(tmp_path, f"id,name,value\n{rows}".encode()))
+
+
+def test_quoted_newlines(tmp_path):
+    rows = "".join(f'{i},"line one\nline two {i}",x\n' for i in range(40))
+    path = write(tmp_path, f"id,text,tag\n{rows}".encode())
+    assert len(split_records(path, RANGE_BYTES)[1]) > 1
+    assert_matches_read_csv(path)
+
+
+def test_doubled_quotes(tmp_path):
+    rows = "".join(f'{i},"she said ""hi\n{i}""",y\n' for i in range(40))
+    assert_matches_read_csv(write(tmp_path, f"id,text,tag\n{rows}".encode()))
+
+
+def test_crlf_line_endings(tmp_path):
+    rows = "".join(f"{i},value {i}\r\n" for i in range(100))
+    assert_matches_read_csv(write(tmp_path, f"id,text\r\n{rows}".encode()))
+
+
+def test_last_record_without_newline(tmp_path):
+    rows = "\n".join(f"{i},{i * 2}" for i in range(100))
+    assert_matches_read_csv(write(tmp_path, f"a,b\n{rows}".encode()))
+
+
+def test_header_only(tmp_path):
+    path = write(tmp_path, b"a,b,c\n")
+    actual = parse_parallel(path)
+    assert list(actual.columns) == ["a", "b", "c"]
+    assert actual.empty
+
+
+def test_cr_only_line_endings_are_left_to_the_sequential_parser(tmp_path):
+    rows = "".join(f"{i},{i * 2}\r" for i in range(3000))
+    path = write(tmp_path, f"a,b\r{rows}".encode())
+    assert split_records(path, RANGE_BYTES) is None
+    assert len(pd.read_csv(path)) == 3000
+
+
+def test_header_without_newline_is_left_to_the_sequential_parser(tmp_path):
+    assert split_records(write(tmp_path, b"a,b,c"), RANGE_BYTES) is None
+
+
+def test_unbalanced_quotes_are_left_to_the_sequential_parser(tmp_path):
+    assert split_records(write(tmp_path, b'a,b\n1,x"y\n2,z\n'), RANGE_BYTES) is None
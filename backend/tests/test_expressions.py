@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from expressions import ExpressionError, RowTransform, compile_expression
+
+
+@pytest.fixture
+def df():
+    return pd.DataFrame({
+        "price": [1, 2, 3],
+        "name": ["Apple", "banana", "Cherry"],
+        "Order Date": ["2024-01-01", "2024-02-01", "2024-03-01"],
+    })
+
+
+@pytest.mark.parametrize("text", [
+    "lambda: 1",
+    "[x for x in price]",
+    "{'a': 1}",
+    "price if (x := 1) else 0",
+    "f'{price}'",
+    "price[0]",
+    "*price",
+])
+def test_rejects_unsupported_nodes(text):
+    with pytest.raises(ExpressionError):
+        compile_expression(text)
+
+
+@pytest.mark.parametrize("text", [
+    "price.__class__",
+    "name.str.lower()",
+    "().__class__.__bases__",
+    "__import__('os')",
+    "getattr(price, '__class__')",
+    "eval('1')",
+    "price()",
+    "lower(name, x=1)",
+])
+def test_rejects_attribute_and_call_access(text):
+    with pytest.raises(ExpressionError):
+        compile_expression(text)
+
+
+def test_dunder_names_are_only_columns(df):
+    expression = compile_expression("__builtins__ == 1")
+    assert expression.columns == ["__builtins__"]
+    with pytest.raises(ExpressionError, match="Unknown column"):
+        expression.evaluate(df)
+
+
+def test_pow_is_float_and_overflows_to_inf(df):
+    values = compile_expression("price ** 2").values(df)
+    assert values.tolist() == [1.0, 4.0, 9.0]
+    assert np.isinf(compile_expression("10 ** 400 + price").values(df)).all()
+
+
+def test_contains_is_literal_and_case_insensitive(df):
+    assert compile_expression('contains(name, "AN")').mask(df).tolist() == [False, True, False]
+    assert not compile_expression('contains(name, ".*")').mask(df).any()
+
+
+def test_contains_needs_a_column(df):
+    with pytest.raises(ExpressionError, match="expects a column"):
+        compile_expression('contains("abc", "a")').evaluate(df)
+
+
+def test_backtick_columns(df):
+    mask = compile_expression('`Order Date` >= "2024-02-01"').mask(df)
+    assert mask.tolist() == [False, True, True]
+
+
+def test_derived_column_may_shadow_the_column_it_reads(df):
+    transform = RowTransform("price > 2", ["price=price * 2"])
+    assert transform.source_columns(["price"]) == ["price"]
+    assert transform.apply(df, ["price"])["price"].tolist() == [4.0, 6.0]
+
+
+def test_derived_columns_see_earlier_ones(df):
+    transform = RowTransform(None, ["double=price * 2", "quad=double * 2"])
+    assert transform.source_columns(["quad"]) == ["price"]
+    assert transform.apply(df, ["quad"])["quad"].tolist() == [4.0, 8.0, 12.0]
@@ -2,7 +2,7 @@ import { BarChart, Bar, LineChart, Line, PieChart, Pie, Cell, XAxis, YAxis, Cart
 
 const COLORS = ['#3b82f6', '#8b5cf6', '#ec4899', '#10b981', '#f59e0b', '#ef4444', '#06b6d4', '#6366f1'];
 
-export default function ChartView({ data, type = 'bar', xKey, yKey }) {
+export default function ChartView({ data, type = 'bar', xKey, yKey, progress = null }) {
   if (!data || data.length === 0) {
     return (
       <div className="bg-white dark:bg-gray-800 rounded-xl shadow-lg p-12 text-center">
@@ -118,6 +118,18 @@ export default function ChartView({ data, type = 'bar', xKey, yKey }) {
 
   return (
     <div className="bg-white dark:bg-gray-800 rounded-xl shadow-lg p-6">
+      {/* Partial results are shown while the exact aggregation streams in */}
+      {progress !== null && (
+        <div className="mb-4 flex items-center space-x-3 text-sm text-gray-500 dark:text-gray-400">
+          <div className="flex-1 h-1.5 bg-gray-200 dark:bg-gray-700 rounded-full overflow-hidden">
+            <div
+              className="h-full bg-blue-500 transition-all"
+              style={{ width: `${Math.round(progress * 100)}%` }}
+            />
+          </div>
+          <span>Refining… {Math.round(progress * 100)}%</span>
+        </div>
+      )}
       {renderChart()}
     </div>
   );
@@ -1,4 +1,4 @@
-import { useState, useEffect } from 'react';
+import { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { 
   Database, 
@@ -8,25 +8,47 @@ import {
   Loader2,
   AlertCircle,
   TrendingUp,
-  Calendar
+  Calendar,
+  Bookmark
 } from 'lucide-react';
-import { getDatasets, deleteDataset, getDatasetData, getChartData } from '../services/dataService';
+import {
+  getDatasets,
+  getDatasetTotals,
+  deleteDataset,
+  getDatasetData,
+  getChartData,
+  streamChartData,
+  getDatasetCharts,
+  saveChart,
+  deleteSavedChart,
+} from '../services/dataService';
 import DataTable from '../components/DataTable';
 import ChartView from '../components/ChartView';
 
+const DATASET_PAGE_SIZE = 50;
+
 export default function Dashboard() {
   const [datasets, setDatasets] = useState([]);
+  const [datasetTotals, setDatasetTotals] = useState(null);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [selectedDataset, setSelectedDataset] = useState(null);
   const [tableData, setTableData] = useState([]);
   const [chartData, setChartData] = useState(null);
+  const [chartProgress, setChartProgress] = useState(null);
+  const chartStream = useRef(null);
+  const [savedCharts, setSavedCharts] = useState([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
   const [viewMode, setViewMode] = useState('table'); // 'table' or 'chart'
   const [chartConfig, setChartConfig] = useState({
     type: 'bar',
     column: '',
-    aggregation: 'count'
+    aggregation: 'count',
+    progressive: false
   });
+  const [rowFilter, setRowFilter] = useState('');
+  const [filterDraft, setFilterDraft] = useState('');
   const [currentPage, setCurrentPage] = useState(1);
   const [totalPages, setTotalPages] = useState(1);
   const navigate = useNavigate();
@@ -43,13 +65,26 @@ export default function Dashboard() {
         fetchChartData();
       }
     }
-  }, [selectedDataset, currentPage, viewMode, chartConfig]);
+  }, [selectedDataset, currentPage, viewMode, chartConfig, rowFilter]);
+
+  useEffect(() => {
+    if (selectedDataset) {
+      fetchSavedCharts();
+    } else {
+      setSavedCharts([]);
+    }
+  }, [selectedDataset]);
 
   const fetchDatasets = async () => {
     try {
       setLoading(true);
-      const response = await getDatasets();
+      const [response, totals] = await Promise.all([
+        getDatasets({ limit: DATASET_PAGE_SIZE }),
+        getDatasetTotals(),
+      ]);
       setDatasets(response.data);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+      setDatasetTotals(totals.data);
       if (response.data.length > 0) {
         setSelectedDataset(response.data[0]);
       }
@@ -60,33 +95,116 @@ export default function Dashboard() {
     }
   };
 
+  const loadMoreDatasets = async () => {
+    if (!nextCursor) return;
+
+    try {
+      setLoadingMore(true);
+      const response = await getDatasets({ limit: DATASET_PAGE_SIZE, cursor: nextCursor });
+      setDatasets((current) => [...current, ...response.data]);
+      setNextCursor(response.headers['x-next-cursor'] || null);
+    } catch (err) {
+      setError('Failed to load datasets');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const fetchTableData = async () => {
     if (!selectedDataset) return;
 
     try {
       const response = await getDatasetData(selectedDataset.id, {
         page: currentPage,
-        page_size: 20
+        page_size: 20,
+        ...(rowFilter && { filter: rowFilter }),
       });
       setTableData(response.data.data || []);
+      setError('');
       setTotalPages(response.data.total_pages || 1);
     } catch (err) {
-      setError('Failed to load table data');
+      setError(err.response?.data?.detail || 'Failed to load table data');
     }
   };
 
   const fetchChartData = async () => {
     if (!selectedDataset || !chartConfig.column) return;
 
+    // Only the latest chart request may update the chart
+    chartStream.current?.abort();
+    const controller = new AbortController();
+    chartStream.current = controller;
+
     try {
-      const response = await getChartData(
+      // Histograms have no partial results; otherwise stream only on request,
+      // since the regular endpoint is cached, coalesced and revalidated
+      if (!chartConfig.progressive || chartConfig.aggregation === 'histogram') {
+        const result = await getChartData(selectedDataset.id, chartConfig.column, chartConfig.aggregation, {
+          ...(chartConfig.aggregation === 'histogram' && { binning: 'fd' }),
+          ...(rowFilter && { filter: rowFilter }),
+        });
+        if (chartStream.current === controller) {
+          setChartData(result.data);
+        }
+        return;
+      }
+
+      const result = await streamChartData(
         selectedDataset.id,
         chartConfig.column,
-        chartConfig.aggregation
+        chartConfig.aggregation,
+        {
+          ...(rowFilter && { filter: rowFilter }),
+          signal: controller.signal,
+          onPartial: (partial) => {
+            setChartData(partial.data);
+            setChartProgress(partial.rows_processed / partial.total_rows);
+          },
+        }
       );
-      setChartData(response.data);
+      setChartData(result.data);
+    } catch (err) {
+      if (err.name !== 'AbortError') {
+        setError('Failed to load chart data');
+      }
+    } finally {
+      if (chartStream.current === controller) {
+        setChartProgress(null);
+      }
+    }
+  };
+
+  const fetchSavedCharts = async () => {
+    try {
+      // Precomputed on upload: one lookup, no aggregation
+      const response = await getDatasetCharts(selectedDataset.id);
+      setSavedCharts(response.data.charts);
     } catch (err) {
-      setError('Failed to load chart data');
+      setSavedCharts([]);
+    }
+  };
+
+  const handleSaveChart = async () => {
+    try {
+      await saveChart({
+        column: chartConfig.column,
+        aggregation: chartConfig.aggregation,
+        filter: rowFilter || null,
+        chart_type: chartConfig.type,
+        ...(chartConfig.aggregation === 'histogram' && { binning: 'fd' }),
+      });
+      fetchSavedCharts();
+    } catch (err) {
+      setError(err.response?.data?.detail || 'Failed to save chart');
+    }
+  };
+
+  const handleDeleteSavedChart = async (chartId) => {
+    try {
+      await deleteSavedChart(chartId);
+      setSavedCharts((current) => current.filter((chart) => chart.id !== chartId));
+    } catch (err) {
+      setError('Failed to delete saved chart');
     }
   };
 
@@ -168,7 +286,9 @@ export default function Dashboard() {
               My Datasets
             </h1>
             <p className="text-gray-600 dark:text-gray-300">
-              {datasets.length} dataset{datasets.length !== 1 ? 's' : ''} available
+              {datasetTotals
+                ? `${datasetTotals.dataset_count} dataset${datasetTotals.dataset_count !== 1 ? 's' : ''} · ${datasetTotals.total_rows.toLocaleString()} rows · ${(datasetTotals.total_bytes / 1024 / 1024).toFixed(2)} MB`
+                : `${datasets.length} dataset${datasets.length !== 1 ? 's' : ''} available`}
             </p>
           </div>
           <button
@@ -228,6 +348,15 @@ export default function Dashboard() {
                   </div>
                 </div>
               ))}
+              {nextCursor && (
+                <button
+                  onClick={loadMoreDatasets}
+                  disabled={loadingMore}
+                  className="w-full p-2 text-sm font-medium text-blue-600 dark:text-blue-400 hover:bg-blue-50 dark:hover:bg-blue-900/30 rounded-lg transition-colors disabled:opacity-50"
+                >
+                  {loadingMore ? 'Loading...' : 'Load more'}
+                </button>
+              )}
             </div>
           </div>
 
@@ -296,6 +425,30 @@ export default function Dashboard() {
                       </button>
                     </div>
 
+                    {/* Row filter, e.g. amount > 100 and region == "EU" */}
+                    <form
+                      onSubmit={(e) => {
+                        e.preventDefault();
+                        setRowFilter(filterDraft.trim());
+                        setCurrentPage(1);
+                      }}
+                      className="flex gap-2 flex-1 min-w-[16rem]"
+                    >
+                      <input
+                        type="text"
+                        value={filterDraft}
+                        onChange={(e) => setFilterDraft(e.target.value)}
+                        placeholder='Filter rows, e.g. amount > 100 and region == "EU"'
+                        className="flex-1 px-4 py-2 border border-gray-300 dark:border-gray-600 rounded-lg bg-white dark:bg-gray-700 text-gray-900 dark:text-white"
+                      />
+                      <button
+                        type="submit"
+                        className="px-4 py-2 bg-blue-600 text-white rounded-lg font-medium hover:bg-blue-700 transition-colors"
+                      >
+                        Apply
+                      </button>
+                    </form>
+
                     {viewMode === 'chart' && (
                       <div className="flex flex-wrap gap-3 flex-1">
                         <select
@@ -331,12 +484,61 @@ export default function Dashboard() {
                           <option value="avg">Average</option>
                           <option value="min">Minimum</option>
                           <option value="max">Maximum</option>
+                          <option value="histogram">Histogram</option>
                         </select>
+
+                        <label className="flex items-center gap-2 text-gray-700 dark:text-gray-300">
+                          <input
+                            type="checkbox"
+                            checked={chartConfig.progressive}
+                            disabled={chartConfig.aggregation === 'histogram'}
+                            onChange={(e) => setChartConfig({ ...chartConfig, progressive: e.target.checked })}
+                          />
+                          Progressive
+                        </label>
+
+                        <button
+                          onClick={handleSaveChart}
+                          disabled={!chartConfig.column}
+                          className="px-4 py-2 bg-blue-600 text-white rounded-lg font-medium hover:bg-blue-700 transition-colors disabled:opacity-50"
+                        >
+                          <Bookmark className="h-5 w-5 inline mr-2" />
+                          Save Chart
+                        </button>
                       </div>
                     )}
                   </div>
                 </div>
 
+                {/* Saved charts, read from stored results */}
+                {viewMode === 'chart' && savedCharts.length > 0 && (
+                  <div className="grid grid-cols-1 lg:grid-cols-2 gap-6 mb-6">
+                    {savedCharts.map((chart) => (
+                      <div key={chart.id} className="bg-white dark:bg-gray-800 rounded-xl shadow-lg p-4">
+                        <div className="flex items-center justify-between mb-2">
+                          <h3 className="font-semibold text-gray-900 dark:text-white">{chart.name}</h3>
+                          <button
+                            onClick={() => handleDeleteSavedChart(chart.id)}
+                            className="p-1 text-gray-400 hover:text-red-600 transition-colors"
+                          >
+                            <Trash2 className="h-4 w-4" />
+                          </button>
+                        </div>
+                        {chart.error ? (
+                          <p className="text-sm text-red-600 dark:text-red-400">{chart.error}</p>
+                        ) : (
+                          <ChartView
+                            data={chart.data}
+                            type={chart.chart_type}
+                            xKey={chart.column}
+                            yKey={chart.aggregation}
+                          />
+                        )}
+                      </div>
+                    ))}
+                  </div>
+                )}
+
                 {/* Data Display */}
                 {viewMode === 'table' ? (
                   <DataTable
@@ -353,6 +555,7 @@ export default function Dashboard() {
                       type={chartConfig.type}
                       xKey={chartConfig.column}
                       yKey={chartConfig.aggregation}
+                      progress={chartProgress}
                     />
                   ) : (
                     <div className="bg-white dark:bg-gray-800 rounded-xl shadow-lg p-12 text-center">
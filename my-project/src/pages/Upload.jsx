@@ -1,12 +1,18 @@
 import { useState } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Upload as UploadIcon, File, X, AlertCircle, CheckCircle, Loader2 } from 'lucide-react';
-import { uploadFile } from '../services/dataService';
+import { createUploadJob, getUploadJob } from '../services/dataService';
+
+const JOB_POLL_INTERVAL_MS = 1000;
+
+const sleep = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
 
 export default function Upload() {
   const [file, setFile] = useState(null);
   const [uploading, setUploading] = useState(false);
   const [uploadProgress, setUploadProgress] = useState(0);
+  const [processing, setProcessing] = useState(false);
+  const [rowsProcessed, setRowsProcessed] = useState(0);
   const [error, setError] = useState('');
   const [success, setSuccess] = useState('');
   const [dragActive, setDragActive] = useState(false);
@@ -73,22 +79,38 @@ export default function Upload() {
     setError('');
     setSuccess('');
     setUploadProgress(0);
+    setRowsProcessed(0);
 
     try {
-      await uploadFile(file, (progressEvent) => {
+      const response = await createUploadJob(file, (progressEvent) => {
         const progress = Math.round((progressEvent.loaded * 100) / progressEvent.total);
         setUploadProgress(progress);
       });
 
-      setSuccess('File uploaded successfully!');
+      // The server parses and stores the file in the background; poll until done
+      setProcessing(true);
+      const jobId = response.data.job_id;
+      let job = response.data;
+      while (job.status === 'queued' || job.status === 'running') {
+        await sleep(JOB_POLL_INTERVAL_MS);
+        job = (await getUploadJob(jobId)).data;
+        setRowsProcessed(job.rows_processed || 0);
+      }
+
+      if (job.status === 'failed') {
+        throw new Error(job.error || 'Failed to process file');
+      }
+
+      setSuccess(`File uploaded successfully! ${job.rows_processed.toLocaleString()} rows processed.`);
       setTimeout(() => {
         navigate('/dashboard');
       }, 1500);
     } catch (err) {
-      setError(err.response?.data?.detail || 'Failed to upload file. Please try again.');
+      setError(err.response?.data?.detail || err.message || 'Failed to upload file. Please try again.');
       setUploadProgress(0);
     } finally {
       setUploading(false);
+      setProcessing(false);
     }
   };
 
@@ -204,9 +226,11 @@ export default function Upload() {
               {uploading && (
                 <div className="space-y-2">
                   <div className="flex justify-between text-sm">
-                    <span className="text-gray-600 dark:text-gray-400">Uploading...</span>
+                    <span className="text-gray-600 dark:text-gray-400">
+                      {processing ? 'Processing...' : 'Uploading...'}
+                    </span>
                     <span className="text-blue-600 dark:text-blue-400 font-semibold">
-                      {uploadProgress}%
+                      {processing ? `${rowsProcessed.toLocaleString()} rows` : `${uploadProgress}%`}
                     </span>
                   </div>
                   <div className="h-2 bg-gray-200 dark:bg-gray-700 rounded-full overflow-hidden">
@@ -228,7 +252,7 @@ export default function Upload() {
                   {uploading ? (
                     <>
                       <Loader2 className="h-5 w-5 animate-spin" />
-                      <span>Uploading...</span>
+                      <span>{processing ? 'Processing...' : 'Uploading...'}</span>
                     </>
                   ) : (
                     <>
@@ -1,4 +1,4 @@
-import api from './api';
+import api, { API_URL } from './api';
 
 export const uploadFile = async (file, onUploadProgress) => {
   const formData = new FormData();
@@ -13,13 +13,56 @@ export const uploadFile = async (file, onUploadProgress) => {
   return response;
 };
 
-export const getDatasets = async () => {
-  const response = await api.get('/data/datasets');
+export const createUploadJob = async (file, onUploadProgress, options = {}) => {
+  const formData = new FormData();
+  formData.append('file', file);
+  // Excel only: sheet name or zero-based index, and 1-based header row
+  if (options.sheet) formData.append('sheet', options.sheet);
+  if (options.headerRow) formData.append('header_row', options.headerRow);
+
+  const response = await api.post('/upload/jobs', formData, {
+    headers: {
+      'Content-Type': 'multipart/form-data',
+    },
+    onUploadProgress,
+  });
   return response;
 };
 
+export const getUploadJob = async (jobId) => {
+  const response = await api.get(`/upload/jobs/${jobId}`);
+  return response;
+};
+
+export const appendToDataset = async (datasetId, file, onUploadProgress) => {
+  const formData = new FormData();
+  formData.append('file', file);
+
+  const response = await api.post(`/data/${datasetId}/append`, formData, {
+    headers: {
+      'Content-Type': 'multipart/form-data',
+    },
+    onUploadProgress,
+  });
+  return response;
+};
+
+export const getDatasets = async (params = {}) => {
+  const response = await api.get('/data/datasets', { params });
+  return response;
+};
+
+export const getDatasetTotals = async () => {
+  const response = await api.get('/data/datasets/totals');
+  return response;
+};
+
+// params may include filter (an expression) and derive (['name=expression', ...])
 export const getDatasetData = async (datasetId, params = {}) => {
-  const response = await api.get(`/data/${datasetId}`, { params });
+  const response = await api.get(`/data/${datasetId}`, {
+    params,
+    paramsSerializer: { indexes: null },
+  });
   return response;
 };
 
@@ -28,14 +71,107 @@ export const getDatasetMetadata = async (datasetId) => {
   return response;
 };
 
-export const getChartData = async (datasetId, column, aggregation = 'count') => {
+export const getChartData = async (datasetId, column, aggregation = 'count', options = {}) => {
   const response = await api.get(`/data/${datasetId}/summary`, {
-    params: { column, aggregation },
+    params: { column, aggregation, ...options },
+    paramsSerializer: { indexes: null },
+  });
+  return response;
+};
+
+// Streams a summary over Server-Sent Events: onPartial receives each refined
+// approximation, and the promise resolves with the exact final result
+export const streamChartData = async (datasetId, column, aggregation = 'count', options = {}) => {
+  const { onPartial, signal, ...params } = options;
+  const query = new URLSearchParams({ column, aggregation });
+  Object.entries(params).forEach(([key, value]) => {
+    if (value === undefined || value === null) return;
+    [].concat(value).forEach((item) => query.append(key, item));
+  });
+
+  const response = await fetch(`${API_URL}/data/${datasetId}/summary/stream?${query}`, {
+    headers: { Authorization: `Bearer ${localStorage.getItem('token')}` },
+    signal,
+  });
+  if (!response.ok) {
+    throw new Error(`Summary stream failed with status ${response.status}`);
+  }
+
+  const reader = response.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = '';
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    let boundary;
+    while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+      const block = buffer.slice(0, boundary);
+      buffer = buffer.slice(boundary + 2);
+      const event = block.match(/^event: (.*)$/m)?.[1];
+      const data = JSON.parse(block.match(/^data: (.*)$/m)?.[1] || 'null');
+
+      if (event === 'partial' && onPartial) onPartial(data);
+      if (event === 'result') return data;
+      if (event === 'error') throw new Error(data.detail);
+    }
+  }
+  throw new Error('Summary stream ended early');
+};
+
+export const getPivotData = async (datasetId, rowColumn, columnColumn, aggregation = 'count', options = {}) => {
+  const response = await api.get(`/data/${datasetId}/pivot`, {
+    params: { row_column: rowColumn, column_column: columnColumn, aggregation, ...options },
   });
   return response;
 };
 
+export const getColumnQuantiles = async (datasetId, column, params = {}) => {
+  const response = await api.get(`/data/${datasetId}/quantiles`, {
+    params: { column, ...params },
+    paramsSerializer: { indexes: null },
+  });
+  return response;
+};
+
+export const joinDatasets = async (joinRequest) => {
+  const response = await api.post('/data/join', joinRequest);
+  return response;
+};
+
 export const deleteDataset = async (datasetId) => {
   const response = await api.delete(`/data/${datasetId}`);
   return response;
 };
+
+export const deleteDatasets = async (datasetIds) => {
+  const response = await api.post('/data/datasets/delete', { dataset_ids: datasetIds });
+  return response;
+};
+
+export const setDatasetExpiry = async (datasetId, expiresAt) => {
+  const response = await api.put(`/data/${datasetId}/expiry`, { expires_at: expiresAt });
+  return response;
+};
+
+export const getSavedCharts = async () => {
+  const response = await api.get('/charts');
+  return response;
+};
+
+export const saveChart = async (definition) => {
+  const response = await api.post('/charts', definition);
+  return response;
+};
+
+export const deleteSavedChart = async (chartId) => {
+  const response = await api.delete(`/charts/${chartId}`);
+  return response;
+};
+
+// Stored results of the user's saved charts for one dataset (computed on upload)
+export const getDatasetCharts = async (datasetId) => {
+  const response = await api.get(`/data/${datasetId}/charts`);
+  return response;
+};